@@ -0,0 +1,168 @@
+"""Times the hot paths of a backtest on synthetic data.
+
+    python -m benchmarks.run --assets 8 --years 20 --depth 3 --output bench.json
+    python -m benchmarks.run --compare bench.json
+
+Each case reports calls per second and peak traced memory. Optimize
+results are not memoized during the run, so the solvers themselves are
+timed.
+"""
+
+import gc
+import json
+import time
+import platform
+import datetime
+import tracemalloc
+
+import click
+import numpy as np
+import pandas as pd
+
+from util.memo import OPTIMIZE_CACHE
+from util.backtester import SanityBacktester
+from util.RiskParityPortfolio import RiskParityPortfolio
+from util.EqualWeightPortfolio import EqualWeightPortfolio
+from benchmarks.synthetic import load_assets, build_tree
+
+
+def _measure(func, calls):
+    """Runs `func` `calls` times. Returns (seconds, peak bytes), with the
+    memory measured on a separate traced run so tracing doesn't skew the
+    timing.
+    """
+    gc.collect()
+    start = time.perf_counter()
+    for _ in range(calls):
+        func()
+    seconds = time.perf_counter() - start
+
+    gc.collect()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def _dates(index, n):
+    """`n` dates spread over the second half of the history."""
+    positions = np.linspace(len(index) // 2, len(index) - 1, n).astype(int)
+    return index[positions]
+
+
+def build_cases(assets, depth, n_dates):
+    """Returns {case name: (callable doing one unit of work, calls)}."""
+    root = build_tree(assets, depth)
+    risk_parity = RiskParityPortfolio(assets[:2], volatility_target=0.1)
+    equal_weight = EqualWeightPortfolio(
+        [RiskParityPortfolio(assets[i:i + 2]) for i in range(0, len(assets), 2)],
+        volatility_target=0.1,
+    )
+    dates = _dates(root.asset_df.index, n_dates)
+    start, end = root.asset_df.index[len(root.asset_df) // 4], dates[-1]
+
+    def each_date(func):
+        return lambda: [func(date) for date in dates]
+
+    return {
+        "Asset.last_volatility": (
+            each_date(lambda date: assets[0].last_volatility(window=60, as_of_date=date)),
+            5,
+        ),
+        "RiskParityPortfolio.optimize": (each_date(risk_parity.optimize), 5),
+        "EqualWeightPortfolio.optimize (vol target)": (
+            each_date(equal_weight.optimize), 3
+        ),
+        "Portfolio.covariance_matrix": (
+            each_date(lambda date: root.covariance_matrix(as_of_date=date)), 3
+        ),
+        "SanityBacktester.backtest": (
+            lambda: SanityBacktester(root).backtest(start, end), 1
+        ),
+    }, n_dates
+
+
+def run(n_assets, years, depth, n_dates, seed) -> dict:
+    assets = load_assets(n_assets, years, seed=seed)
+    cases, n_dates = build_cases(assets, depth, n_dates)
+
+    maxsize = OPTIMIZE_CACHE.maxsize
+    OPTIMIZE_CACHE.maxsize = 0
+    results = {}
+    try:
+        for name, (func, calls) in cases.items():
+            func()  # warm up lazily built indexes
+            seconds, peak = _measure(func, calls)
+            units = calls if name == "SanityBacktester.backtest" else calls * n_dates
+            results[name] = {
+                "calls": units,
+                "seconds": seconds,
+                "calls_per_second": units / seconds if seconds else float("inf"),
+                "peak_memory_mb": peak / 1e6,
+            }
+    finally:
+        OPTIMIZE_CACHE.maxsize = maxsize
+
+    return {
+        "config": {
+            "assets": n_assets,
+            "years": years,
+            "depth": depth,
+            "dates": n_dates,
+            "seed": seed,
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "machine": platform.machine(),
+        },
+        "timestamp": datetime.datetime.now().isoformat(),
+        "results": results,
+    }
+
+
+def report(report_dict, baseline=None) -> pd.DataFrame:
+    table = pd.DataFrame(report_dict["results"]).T
+    table = table[["calls", "calls_per_second", "peak_memory_mb"]]
+    if baseline is not None:
+        before = pd.DataFrame(baseline["results"]).T
+        table["speedup"] = table["calls_per_second"] / before["calls_per_second"]
+        table["memory_ratio"] = table["peak_memory_mb"] / before["peak_memory_mb"]
+    return table
+
+
+@click.command()
+@click.option("--assets", "n_assets", default=8, help="Number of synthetic assets.")
+@click.option("--years", default=20, help="Years of daily history per asset.")
+@click.option("--depth", default=3, help="Nesting depth of the portfolio tree.")
+@click.option("--dates", "n_dates", default=200, help="As-of dates per case.")
+@click.option("--seed", default=0, help="Seed of the synthetic prices.")
+@click.option("--output", default="", help="Write the JSON results here.")
+@click.option("--compare", default="", help="JSON results of a previous run.")
+def main(n_assets, years, depth, n_dates, seed, output, compare):
+    """Benchmark optimize, covariance and backtest hot paths."""
+    baseline = None
+    if compare:
+        with open(compare, "r") as f:
+            baseline = json.load(f)
+        # Rerun with the same configuration for a fair comparison.
+        n_assets = baseline["config"]["assets"]
+        years = baseline["config"]["years"]
+        depth = baseline["config"]["depth"]
+        n_dates = baseline["config"]["dates"]
+        seed = baseline["config"]["seed"]
+
+    results = run(n_assets, years, depth, n_dates, seed)
+    print(results["config"])
+    print(report(results, baseline).to_string(float_format="%0.3f"))
+
+    if output:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
+        print("Output benchmark results to: %s" % output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Synthetic price histories served through a fake Engine, so benchmarks are
+reproducible and need no network.
+"""
+
+import zlib
+import datetime
+import numpy as np
+import pandas as pd
+
+from util import timeseries
+from util.engine import Engine
+from util.stock import Stock
+from util.RiskParityPortfolio import RiskParityPortfolio
+from util.EqualWeightPortfolio import EqualWeightPortfolio
+
+END_DATE = datetime.datetime(2020, 12, 31)
+
+
+class SyntheticEngine(Engine):
+    """Geometric random walks, seeded per symbol. Configure `years` and
+    `seed` on the class before loading assets.
+    """
+    config = {
+        "stock": {
+            'price': 'Adj Close'
+        }
+    }
+
+    years = 20
+    seed = 0
+
+    @classmethod
+    def get(cls, symbol, **kwargs):
+        rng = np.random.default_rng(
+            [cls.seed, zlib.crc32(symbol.encode("utf-8"))]
+        )
+        index = pd.bdate_range(
+            end=END_DATE, periods=int(cls.years * 252), name="Date"
+        )
+        daily_vol = rng.uniform(0.005, 0.025)
+        returns = rng.normal(0.0002, daily_vol, len(index))
+        prices = 100.0 * np.exp(np.cumsum(returns))
+        return pd.DataFrame({"Adj Close": prices}, index=index)
+
+
+timeseries.ENGINES["synthetic"] = SyntheticEngine
+
+
+def load_assets(n_assets, years, seed=0) -> list:
+    SyntheticEngine.years = years
+    SyntheticEngine.seed = seed
+    symbols = ["S%03d" % i for i in range(n_assets)]
+    cache = Stock.bulk_load(symbols, source="synthetic")
+    return [cache[symbol] for symbol in symbols]
+
+
+def build_tree(assets, depth, group_size=2, volatility_target=0.1):
+    """Nested portfolio over `assets`.
+
+    Depth 1 is a single RiskParityPortfolio. Each extra level groups the
+    assets into RiskParityPortfolios of `group_size` at the bottom and
+    EqualWeightPortfolios above, halving the number of nodes per level. The
+    root is vol targeted.
+    """
+    if depth <= 1:
+        return RiskParityPortfolio(assets, volatility_target=volatility_target)
+
+    nodes = [
+        RiskParityPortfolio(assets[i:i + group_size], volatility_target=volatility_target)
+        for i in range(0, len(assets), group_size)
+    ]
+    for level in range(2, depth):
+        if len(nodes) == 1:
+            break
+        nodes = [
+            EqualWeightPortfolio(nodes[i:i + 2]) for i in range(0, len(nodes), 2)
+        ]
+    return EqualWeightPortfolio(nodes, volatility_target=volatility_target)
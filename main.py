@@ -1,20 +1,72 @@
+import os
 import click
 import datetime
 
 import util
+from util import analytics, montecarlo, rebalancing, sweep, timeseries, walkforward
+from util.cache import PriceCache
+from util.live import LiveState, fingerprint
+from util.LocalEngine import LocalEngine
+from util.panel import PricePanel, set_shared_panel
+from util.profiler import PROFILER
 from util.stock import Stock
 from util.backtester import SanityBacktester
-from util import RiskParityPortfolio, EqualWeightPortfolio
+from util import EqualWeightPortfolio
 
 import yaml
 import numpy as np
+import pandas as pd
 
 
 @click.command()
 @click.argument("settings")
-def all_weather(settings):
+@click.option(
+    "--sweep",
+    "run_sweep",
+    is_flag=True,
+    help="Backtest every combination of the SWEEP grid in the settings.",
+)
+@click.option(
+    "--profile",
+    is_flag=True,
+    help="Time the backtest hot paths and print a profiling report.",
+)
+@click.option(
+    "--profile-output",
+    default="profile.json",
+    help="Where --profile writes its JSON report.",
+)
+@click.option(
+    "--walk-forward",
+    "run_walk_forward",
+    is_flag=True,
+    help="Backtest once over the full history and tabulate the results of "
+    "every WALK_FORWARD start date and horizon.",
+)
+@click.option(
+    "--monte-carlo",
+    "run_monte_carlo",
+    is_flag=True,
+    help="Simulate bootstrapped paths per the MONTE_CARLO settings and "
+    "print the distribution of their metrics.",
+)
+@click.option(
+    "--today",
+    is_flag=True,
+    help="Only print today's weights, updating the saved live state with "
+    "the bars since the last run instead of backtesting.",
+)
+def all_weather(settings, run_sweep, profile, profile_output, run_walk_forward,
+                run_monte_carlo, today):
     """Calculate risk parity portfolio per All Weather."""
     settings = yaml.load(open(settings, "r"), Loader=yaml.Loader)
+    if profile:
+        PROFILER.enable()
+        # Report however the command ends, including the early returns of
+        # --today, --sweep, --walk-forward and --monte-carlo.
+        click.get_current_context().call_on_close(
+            lambda: print_profile(profile_output)
+        )
 
     # Set up dates.
     if "END_DATE" not in settings:
@@ -28,6 +80,7 @@ def all_weather(settings):
     vol_target = settings["VOLATILITY_TARGET"]
     benchmark = settings["BENCHMARK_TICKER"]
     out = settings["OUTPUT_FILE"]
+    source = settings.get("SOURCE", "yahoo")
 
     print("Volatility target: {}%".format(vol_target * 100))
     print("Backtesting from %s to %s." % (start, end))
@@ -35,24 +88,59 @@ def all_weather(settings):
     all_tickers = set(
         np.concatenate(list(settings["ENVIRONMENTS"].values()))
     ).union(set([benchmark]))
+    if run_sweep:
+        all_tickers = all_tickers.union(sweep.sweep_tickers(settings))
+
+    if source == "local":
+        LocalEngine.set_directory(settings.get("LOCAL_DATA_DIR", "data"))
+        print("Reading prices from: %s" % LocalEngine.directory)
+    elif settings.get("PRICE_CACHE_DIR"):
+        print("Using price cache at: %s" % settings["PRICE_CACHE_DIR"])
+        timeseries.set_price_cache(PriceCache(settings["PRICE_CACHE_DIR"]))
+
+    timeseries.set_data_options(
+        price_only=settings.get("PRICE_ONLY", False),
+        dtype=settings.get("PRICE_DTYPE"),
+    )
+
+    if today:
+        print_todays_weights(settings, vol_target, source)
+        return
 
     print("\nGetting stocks...")
-    cache = {
-        ticker: Stock(ticker, ticker) for ticker in all_tickers
-    }  # To avoid making unnecessary API calls.
+    # Fetched concurrently, and kept to avoid making unnecessary API calls.
+    cache = Stock.bulk_load(sorted(all_tickers), source=source)
 
-    print("\nForming portfolios...")
-    portfolios = {
-        environment: RiskParityPortfolio(
-            [
-                cache[ticker]
-                for ticker in settings["ENVIRONMENTS"][environment]
-            ],
-            volatility_target=vol_target,
+    if run_sweep:
+        sweep_settings = settings.get("SWEEP") or {}
+        sweep_out = sweep_settings.get("OUTPUT_FILE", "sweep.csv")
+        print("\nSweeping %d combinations..." % len(sweep.parameter_grid(settings)))
+        results = sweep.run_sweep(
+            cache, settings, start, end, processes=sweep_settings.get("PROCESSES")
         )
-        for environment in settings["ENVIRONMENTS"]
-    }
-    all_weather = EqualWeightPortfolio(list(portfolios.values()))
+        print(results.to_string(float_format="%0.3f"))
+        print("Output sweep results to: %s" % sweep_out)
+        results.to_csv(sweep_out, index=False)
+        return
+
+    print("\nForming portfolios...")
+    # One aligned price matrix over every ticker, shared by all portfolios.
+    set_shared_panel(PricePanel(list(cache.values())))
+    all_weather, _ = sweep.build_all_weather(
+        cache,
+        settings["ENVIRONMENTS"],
+        vol_target,
+        estimator=settings.get("VOLATILITY_ESTIMATOR", "rolling"),
+        halflife=settings.get("HALFLIFE"),
+    )
+
+    if run_walk_forward:
+        print_walk_forward(all_weather, settings, start, end)
+        return
+
+    if run_monte_carlo:
+        print_monte_carlo(all_weather, settings)
+        return
 
     print("\nBacktesting...")
 
@@ -66,6 +154,24 @@ def all_weather(settings):
         "All Weather Sharpe: %0.3f" % util.print_annualized_sharpe(aw_pcts.sum(axis=1))
     )
 
+    # Same weights, with holdings drifting between trades and paying
+    # trading costs and slippage.
+    aw_net = all_weather_bt.simulate_drift(band=settings.get("REBALANCE_BAND"))
+    print(
+        "All Weather turnover: %0.2f per year"
+        % rebalancing.annual_turnover(aw_net["Turnover"].to_numpy())
+    )
+
+    returns = pd.concat(
+        {
+            "All Weather": aw_pcts.sum(axis=1),
+            "All Weather (net)": aw_net["Return"],
+            "Benchmark": benchmark_pcts[benchmark_pcts.columns[0]],
+        },
+        axis=1,
+    ).dropna()
+    print("\n" + analytics.summary(returns).to_string(float_format="%0.3f"))
+
     all_weather_indexed = util.one_index(aw_pcts.sum(axis=1).dropna())
     benchmark_indexed = util.one_index(
         benchmark_pcts[benchmark_pcts.columns[0]].dropna()
@@ -86,5 +192,128 @@ def all_weather(settings):
         print(key, "\t\t", weights[key]["weight"])
 
 
+def print_profile(profile_output):
+    """Prints the profiling summary and writes the JSON report."""
+    print("\nProfile:")
+    print(PROFILER.summary())
+    print("Output profiling report to: %s" % profile_output)
+    PROFILER.dump(profile_output)
+
+
+def print_walk_forward(all_weather, settings, start, end):
+    """Backtests once from the first date with prices, then slices that one
+    return path for every start date and horizon.
+    """
+    wf_settings = settings.get("WALK_FORWARD") or {}
+    wf_out = wf_settings.get("OUTPUT_FILE", "walk_forward.csv")
+
+    print("\nBacktesting over the full history...")
+    first_date = all_weather.asset_df.index[0]
+    aw_pcts = SanityBacktester(all_weather).backtest(
+        start_date=first_date, end_date=end
+    )
+
+    results = walkforward.walk_forward_years(
+        aw_pcts.sum(axis=1),
+        start=start,
+        end=end,
+        every=wf_settings.get("EVERY", "QS"),
+        horizon_years=wf_settings.get("HORIZONS", [1, 3, 5, 10]),
+    )
+    for metric, table in results.items():
+        print("\n%s by start date (rows) and years held (columns):" % metric)
+        print(table.to_string(float_format="%0.3f"))
+
+    print("Output walk-forward results to: %s" % wf_out)
+    pd.concat(results, axis=1).to_csv(wf_out)
+
+
+def print_monte_carlo(all_weather, settings):
+    """Simulates the All Weather portfolio on bootstrapped returns and
+    prints quantiles of each metric across the paths.
+    """
+    mc_settings = settings.get("MONTE_CARLO") or {}
+    mc_out = mc_settings.get("OUTPUT_FILE", "monte_carlo.csv")
+    n_paths = mc_settings.get("PATHS", 1000)
+
+    print("\nSimulating %d paths..." % n_paths)
+    curves = montecarlo.simulate(
+        all_weather,
+        n_paths=n_paths,
+        length=int(mc_settings.get("YEARS", 10) * analytics.PERIODS_PER_YEAR),
+        block_size=mc_settings.get("BLOCK_SIZE", 20),
+        method=mc_settings.get("METHOD", "stationary"),
+        rebalance_period=mc_settings.get("REBALANCE_PERIOD", 40),
+        chunk_size=mc_settings.get("CHUNK_SIZE", 250),
+        processes=mc_settings.get("PROCESSES", 1),
+        seed=mc_settings.get("SEED"),
+    )
+
+    path_returns = pd.DataFrame((curves[:, 1:] / curves[:, :-1] - 1.0).T)
+    metrics = analytics.summary(path_returns).T
+    quantiles = metrics.quantile([0.05, 0.25, 0.5, 0.75, 0.95]).T
+    quantiles.columns = ["%d%%" % (100 * q) for q in quantiles.columns]
+    print(quantiles.to_string(float_format="%0.3f"))
+
+    print("Output Monte Carlo results to: %s" % mc_out)
+    quantiles.to_csv(mc_out)
+
+
+def print_todays_weights(settings, vol_target, source):
+    """Prints the latest weights from the live state, bootstrapping it from
+    the full history on the first run or after the settings it was built
+    with changed. Later runs only fetch the last few bars.
+    """
+    state_file = settings.get("LIVE_STATE_FILE", "live_state.pkl")
+    settings_fingerprint = fingerprint(settings)
+
+    state = None
+    if os.path.exists(state_file):
+        state = LiveState.load(state_file)
+        # States saved before fingerprints were stored have none.
+        if getattr(state, "fingerprint", None) != settings_fingerprint:
+            print(
+                "\nThe settings changed since %s was saved, rebuilding it."
+                % state_file
+            )
+            state = None
+
+    if state is not None:
+        print("\nUpdating live state from %s..." % state.last_date.date())
+        # Start a week back so every symbol has bars to return even when
+        # there is no new one yet; append drops those already seen.
+        start = state.last_date - datetime.timedelta(days=7)
+        stocks = Stock.bulk_load(
+            state.symbols, source=source, start=start.strftime("%Y-%m-%d")
+        )
+        prices = {
+            symbol: stock.price
+            for symbol, stock in stocks.items()
+            if stock.data is not None and len(stock.data)
+        }
+        if prices:
+            print("Appended %d bars." % state.append(pd.concat(prices, axis=1)))
+    else:
+        print("\nBootstrapping live state from the full history...")
+        tickers = set(np.concatenate(list(settings["ENVIRONMENTS"].values())))
+        cache = Stock.bulk_load(sorted(tickers), source=source)
+        all_weather, _ = sweep.build_all_weather(
+            cache,
+            settings["ENVIRONMENTS"],
+            vol_target,
+            estimator=settings.get("VOLATILITY_ESTIMATOR", "rolling"),
+            halflife=settings.get("HALFLIFE"),
+        )
+        state = LiveState.from_portfolio(all_weather, settings_fingerprint)
+
+    print("\nWeights as of %s:" % state.last_date.date())
+    weights = state.weights()
+    for key in weights.keys():
+        print(key, "\t\t", weights[key])
+
+    state.save(state_file)
+    print("Saved live state to: %s" % state_file)
+
+
 if __name__ == "__main__":
     all_weather()
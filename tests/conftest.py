@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from util import timeseries
+from util.engine import Engine
+from util.memo import OPTIMIZE_CACHE
+from util.panel import set_shared_panel
+from util.stock import Stock
+
+
+class FakeEngine(Engine):
+    """Deterministic random walk prices on a calendar set per symbol."""
+    config = {"stock": {"price": "Adj Close"}}
+    retry_exceptions = ()
+    calendars = {}
+
+    @classmethod
+    def get(cls, symbol, **kwargs):
+        index = cls.calendars[symbol]
+        rng = np.random.default_rng(sum(map(ord, symbol)))
+        returns = rng.normal(0.0003, 0.005 + (len(symbol) % 3) / 200, len(index))
+        prices = 50 * np.exp(np.cumsum(returns))
+        df = pd.DataFrame({"Adj Close": prices}, index=index.rename("Date"))
+        if "start" in kwargs:
+            df = df[df.index >= kwargs["start"]]
+        return df
+
+
+@pytest.fixture
+def stocks(monkeypatch):
+    """Loads Stocks from FakeEngine, given {symbol: DatetimeIndex}."""
+    monkeypatch.setitem(timeseries.ENGINES, "fake", FakeEngine)
+    monkeypatch.setattr(timeseries, "PRICE_CACHE", None)
+    set_shared_panel(None)
+    OPTIMIZE_CACHE.clear()
+
+    def load(calendars):
+        FakeEngine.calendars = dict(calendars)
+        return Stock.bulk_load(list(calendars), source="fake", max_workers=1)
+
+    yield load
+    set_shared_panel(None)
+    OPTIMIZE_CACHE.clear()
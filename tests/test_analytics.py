@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+
+from util import analytics
+
+
+def test_max_drawdown_counts_the_starting_capital_as_a_peak():
+    returns = pd.Series(
+        [-0.1, 0.0, 0.05, -0.02, 0.01, 0.0],
+        index=pd.date_range("2020-01-01", periods=6, freq="B"),
+    )
+    table = analytics.max_drawdown(returns)
+    assert np.isclose(table["Max Drawdown"].iloc[0], -0.1)
+    assert table["Max Drawdown Duration"].iloc[0] == 6
+
+
+def test_max_drawdown_of_a_late_starting_column():
+    returns = pd.DataFrame(
+        {
+            "early": [0.1, -0.05, 0.0, 0.1],
+            "late": [np.nan, np.nan, -0.2, 0.1],
+        },
+        index=pd.date_range("2020-01-01", periods=4, freq="B"),
+    )
+    table = analytics.max_drawdown(returns)
+    assert np.isclose(table.loc["early", "Max Drawdown"], -0.05)
+    assert table.loc["early", "Max Drawdown Duration"] == 2
+    assert np.isclose(table.loc["late", "Max Drawdown"], -0.2)
+    assert table.loc["late", "Max Drawdown Duration"] == 2
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+from util.RiskParityPortfolio import RiskParityPortfolio
+
+WEEKDAYS = pd.bdate_range("2019-01-01", "2020-12-31")
+CALENDARS = {
+    "AAA": WEEKDAYS[100:],
+    "BB": pd.date_range("2019-03-01", "2020-12-31"),  # trades every day
+    "CCCC": WEEKDAYS[::2],
+}
+
+
+def test_asset_df_is_on_the_union_of_its_own_assets_dates(stocks):
+    stocks = stocks(CALENDARS)
+    aaa, bb, cccc = stocks["AAA"], stocks["BB"], stocks["CCCC"]
+
+    forward = RiskParityPortfolio([aaa, cccc]).asset_df
+    backward = RiskParityPortfolio([cccc, aaa]).asset_df
+    # Adding a ticker elsewhere doesn't touch other portfolios' calendars.
+    RiskParityPortfolio([bb, cccc])
+
+    union = CALENDARS["AAA"].union(CALENDARS["CCCC"])
+    assert forward.index.equals(union)
+    assert backward.index.equals(union)
+    pd.testing.assert_frame_equal(forward, backward[forward.columns])
+    assert RiskParityPortfolio([aaa, cccc]).asset_df.index.equals(union)
+
+    # Own prices on own dates, the last one forward filled in between, and
+    # nothing before the first one.
+    expected = aaa.price.reindex(union).ffill()
+    np.testing.assert_array_equal(forward["AAA"].to_numpy(), expected.to_numpy())
+    assert forward["AAA"].isna().sum() == union.get_loc(CALENDARS["AAA"][0])
+
+
+def test_periodic_returns_are_phased_on_the_portfolio_calendar(stocks):
+    stocks = stocks(CALENDARS)
+    portfolio = RiskParityPortfolio(
+        [stocks["AAA"], stocks["BB"]], window=20, periodicity=5
+    )
+    prices = portfolio.asset_df
+    # BB starts first, so the 5-day grid is anchored on its first date.
+    assert prices.index[0] == CALENDARS["BB"][0]
+
+    as_of_date = prices.index[-37]
+    expected = (
+        prices[prices.index <= as_of_date]
+        .pct_change(5, fill_method=None)
+        .iloc[::5]
+        .tail(20)
+        .cov()
+        * 252.0 / 5
+    )
+    actual = portfolio.covariance_matrix(
+        window=20, periodicity=5, as_of_date=as_of_date
+    )
+    np.testing.assert_allclose(actual.to_numpy(), expected.to_numpy(), rtol=1e-9)
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from util.covariance import RollingCovariance
+
+
+def prices():
+    rng = np.random.default_rng(1)
+    index = pd.bdate_range("2020-01-01", periods=300)
+    values = 100 * np.cumprod(1 + rng.normal(0.0, 0.01, (300, 3)), axis=0)
+    frame = pd.DataFrame(values, index=index, columns=["A", "B", "C"])
+    # A late starter and a gap.
+    frame.iloc[:80, 1] = np.nan
+    frame.iloc[150:170, 2] = np.nan
+    return frame
+
+
+@pytest.mark.parametrize("periodicity", [1, 3])
+@pytest.mark.parametrize("min_periods", [None, 15])
+def test_rolling_covariance_matches_pandas(periodicity, min_periods):
+    frame = prices()
+    covariances = RollingCovariance(frame, periodicity=periodicity)
+    returns = frame.pct_change(periodicity, fill_method=None).iloc[::periodicity]
+
+    for position in (10, 60, 85, 120, 160, 175, 299):
+        as_of_date = frame.index[position]
+        expected = (
+            returns[returns.index <= as_of_date]
+            .tail(20)
+            .cov(min_periods=min_periods)
+        )
+        actual = covariances.covariance(
+            as_of_date=as_of_date, window=20, min_periods=min_periods
+        )
+        np.testing.assert_allclose(actual, expected.to_numpy(), rtol=1e-8)
+
+
+def test_rolling_covariance_of_some_symbols():
+    frame = prices()
+    covariances = RollingCovariance(frame)
+    actual = covariances.covariance(window=30, symbols=["C", "A"])
+    expected = frame[["C", "A"]].pct_change(fill_method=None).tail(30).cov()
+    np.testing.assert_allclose(actual, expected.to_numpy(), rtol=1e-8)
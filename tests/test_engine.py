@@ -0,0 +1,77 @@
+import time
+import threading
+
+import pytest
+
+from util.engine import Engine, NoDataError
+
+
+class FakeEngine(Engine):
+    """Returns the symbol, after `failures[symbol]` failed downloads
+    raising `error`.
+    """
+    config = {"stock": {"price": "Close"}}
+    failures = {}
+    error = NoDataError
+    calls = []
+    lock = threading.Lock()
+
+    @classmethod
+    def get(cls, symbol, **kwargs):
+        with cls.lock:
+            cls.calls.append(symbol)
+            attempts = cls.calls.count(symbol)
+        # Finish later symbols first, so results come back out of order.
+        time.sleep(0.01 * (5 - len(symbol)))
+        if attempts <= cls.failures.get(symbol, 0):
+            raise cls.error("No data returned for %s" % symbol)
+        return (symbol, kwargs.get("start"))
+
+
+@pytest.fixture(autouse=True)
+def reset():
+    FakeEngine.failures = {}
+    FakeEngine.calls = []
+    FakeEngine.error = NoDataError
+
+
+def test_get_many_keeps_order_and_dedupes():
+    symbols = ["TLT", "A", "GLD", "A", "VTI", "TLT"]
+    result = FakeEngine.get_many(symbols, backoff=0, start="2020-01-01")
+
+    assert list(result) == ["TLT", "A", "GLD", "VTI"]
+    assert result["GLD"] == ("GLD", "2020-01-01")
+    assert sorted(FakeEngine.calls) == ["A", "GLD", "TLT", "VTI"]
+
+
+def test_get_many_retries_empty_downloads():
+    FakeEngine.failures = {"GLD": 2}
+    result = FakeEngine.get_many(["VTI", "GLD"], retries=2, backoff=0)
+
+    assert result == {"VTI": ("VTI", None), "GLD": ("GLD", None)}
+    assert FakeEngine.calls.count("GLD") == 3
+    assert FakeEngine.calls.count("VTI") == 1
+
+
+def test_get_many_raises_after_the_last_retry():
+    FakeEngine.failures = {"GLD": 3}
+    with pytest.raises(NoDataError):
+        FakeEngine.get_many(["VTI", "GLD"], retries=2, backoff=0)
+    assert FakeEngine.calls.count("GLD") == 3
+
+
+def test_get_many_retries_network_errors():
+    FakeEngine.failures = {"GLD": 1}
+    FakeEngine.error = ConnectionError
+    result = FakeEngine.get_many(["GLD"], retries=2, backoff=0)
+
+    assert result == {"GLD": ("GLD", None)}
+    assert FakeEngine.calls.count("GLD") == 2
+
+
+def test_get_many_does_not_retry_bugs():
+    FakeEngine.failures = {"GLD": 1}
+    FakeEngine.error = TypeError
+    with pytest.raises(TypeError):
+        FakeEngine.get_many(["GLD"], retries=2, backoff=0)
+    assert FakeEngine.calls.count("GLD") == 1
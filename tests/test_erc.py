@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+
+from util.EqualRiskContributionPortfolio import (
+    EqualRiskContributionPortfolio,
+    scale_to_volatility_target,
+    solve_erc,
+)
+
+
+def covariances(n_dates=5, n_assets=4):
+    rng = np.random.default_rng(4)
+    factors = rng.normal(0.0, 0.01, (n_dates, 60, n_assets))
+    factors[:, :, 1] += factors[:, :, 0]  # correlated pair
+    centered = factors - factors.mean(axis=1, keepdims=True)
+    return np.einsum("dti,dtj->dij", centered, centered) / 59 * 252
+
+
+def test_erc_weights_have_equal_risk_contributions():
+    stack = covariances()
+    weights = solve_erc(stack, tolerance=1e-12, max_iterations=2000)
+
+    np.testing.assert_allclose(weights.sum(axis=1), 1.0)
+    assert (weights > 0).all()
+    contributions = weights * np.einsum("dij,dj->di", stack, weights)
+    np.testing.assert_allclose(
+        contributions,
+        np.broadcast_to(contributions.mean(axis=1, keepdims=True), stack.shape[:2]),
+        rtol=1e-8,
+    )
+
+    # Batched solves equal single ones, warm started or not.
+    for date in range(len(stack)):
+        np.testing.assert_allclose(
+            solve_erc(stack[date], tolerance=1e-12, max_iterations=2000),
+            weights[date],
+            rtol=1e-8,
+        )
+        np.testing.assert_allclose(
+            solve_erc(stack[date], x0=weights[date - 1], tolerance=1e-12),
+            weights[date],
+            rtol=1e-8,
+        )
+
+
+def test_erc_leaves_out_assets_without_a_variance():
+    stack = covariances(n_dates=1)[0]
+    stack[2, :] = np.nan
+    stack[:, 2] = np.nan
+    weights = solve_erc(stack, tolerance=1e-12)
+
+    assert np.isnan(weights[2])
+    held = [0, 1, 3]
+    np.testing.assert_allclose(
+        weights[held], solve_erc(stack[np.ix_(held, held)], tolerance=1e-12),
+        rtol=1e-8,
+    )
+
+
+def test_scaling_hits_the_volatility_target():
+    stack = covariances()
+    weights, contributions = scale_to_volatility_target(
+        stack, solve_erc(stack), 0.1 ** 2
+    )
+    np.testing.assert_allclose(contributions.sum(axis=1), 0.1 ** 2)
+    np.testing.assert_allclose(
+        np.einsum("di,dij,dj->d", weights, stack, weights), 0.1 ** 2
+    )
+
+
+def test_portfolio_weights_equalize_contributions(stocks):
+    weekdays = pd.bdate_range("2020-01-01", "2020-12-31")
+    stocks = stocks({"AAA": weekdays, "BB": weekdays, "CCCC": weekdays[40:]})
+    portfolio = EqualRiskContributionPortfolio(
+        [stocks["AAA"], stocks["BB"], stocks["CCCC"]], window=60
+    )
+    dates = weekdays[[20, 70, 150, 250]]
+    batched = portfolio.optimize_many(dates)
+
+    for date in dates:
+        weights = portfolio.optimize(as_of_date=date)
+        contributions = [weights[name]["vol_contribution"] for name in weights]
+        np.testing.assert_allclose(contributions, np.mean(contributions), rtol=1e-6)
+        np.testing.assert_allclose(sum(contributions), 0.1 ** 2, rtol=1e-6)
+        np.testing.assert_allclose(
+            [weights[name]["weight"] for name in weights],
+            batched.loc[date, list(weights)].to_numpy(),
+            rtol=1e-6,
+        )
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from util.ewma import EWMACovariance, ExponentialCovariance
+
+
+def returns():
+    rng = np.random.default_rng(2)
+    frame = pd.DataFrame(rng.normal(0.0, 0.01, (200, 3)), columns=["A", "B", "C"])
+    frame.iloc[:30, 1] = np.nan
+    frame.iloc[90:100, 2] = np.nan
+    return frame
+
+
+def pandas_covariance(frame, halflife, min_periods=0):
+    return (
+        frame.ewm(halflife=halflife, min_periods=min_periods)
+        .cov()
+        .loc[frame.index[-1]]
+        .to_numpy()
+    )
+
+
+@pytest.mark.parametrize("rows", [5, 31, 95, 200])
+def test_ewma_covariance_matches_pandas(rows):
+    frame = returns().iloc[:rows]
+    estimator = EWMACovariance(3, halflife=10)
+    for row in frame.to_numpy():
+        estimator.update(row)
+
+    expected = pandas_covariance(frame, 10)
+    np.testing.assert_allclose(
+        estimator.covariance(), expected, rtol=1e-10, equal_nan=True
+    )
+    np.testing.assert_allclose(
+        estimator.covariance(min_periods=10),
+        pandas_covariance(frame, 10, min_periods=10),
+        rtol=1e-10,
+        equal_nan=True,
+    )
+
+
+def test_ewma_batches_and_round_trips():
+    frame = returns()
+    paths = np.stack([frame.to_numpy(), frame.to_numpy()[::-1]], axis=1)
+    batched = EWMACovariance(3, halflife=15, shape=(2,))
+    variances = batched.update_many(paths)
+
+    for path in range(2):
+        single = EWMACovariance(3, halflife=15)
+        expected = single.update_many(paths[:, path])
+        np.testing.assert_allclose(
+            variances[:, path], expected, rtol=1e-12, equal_nan=True
+        )
+
+    restored = EWMACovariance.from_dict(batched.to_dict())
+    np.testing.assert_array_equal(restored.covariance(), batched.covariance())
+
+
+def test_exponential_covariance_carries_state_between_dates():
+    index = pd.bdate_range("2020-01-01", periods=200)
+    frame = 100 * np.cumprod(1 + returns().fillna(0.0).set_index(index), axis=0)
+    covariances = ExponentialCovariance(frame, periodicity=2, halflife=10)
+
+    pcts = frame.pct_change(2, fill_method=None).iloc[::2]
+    for position in (150, 40, 199, 198):
+        as_of_date = index[position]
+        expected = pandas_covariance(pcts[pcts.index <= as_of_date], 10)
+        np.testing.assert_allclose(
+            covariances.covariance(as_of_date=as_of_date),
+            expected,
+            rtol=1e-10,
+            equal_nan=True,
+        )
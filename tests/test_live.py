@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from util.EqualRiskContributionPortfolio import EqualRiskContributionPortfolio
+from util.EqualWeightPortfolio import EqualWeightPortfolio
+from util.RiskParityPortfolio import RiskParityPortfolio
+from util.live import LiveState
+from util.stock import Stock
+
+WEEKDAYS = pd.bdate_range("2019-01-01", "2020-12-31")
+CALENDARS = {
+    "AAA": WEEKDAYS,
+    "BB": WEEKDAYS[60:],
+    "CCCC": pd.date_range("2019-03-01", "2020-12-31"),  # trades every day
+    "DD": WEEKDAYS,
+}
+CUT = pd.Timestamp("2020-09-15")
+
+
+def all_weather(stocks):
+    return EqualWeightPortfolio(
+        [
+            RiskParityPortfolio([stocks["AAA"], stocks["BB"]], volatility_target=0.15),
+            RiskParityPortfolio([stocks["CCCC"], stocks["DD"]], volatility_target=0.15),
+        ]
+    )
+
+
+def ewma(stocks):
+    return RiskParityPortfolio(
+        [stocks["AAA"], stocks["CCCC"], stocks["DD"]],
+        periodicity=2,
+        estimator="ewma",
+        halflife=20,
+    )
+
+
+def erc(stocks):
+    return EqualRiskContributionPortfolio(
+        [stocks["AAA"], stocks["BB"], stocks["DD"]], window=40
+    )
+
+
+def mixed(stocks):
+    return EqualWeightPortfolio(
+        [
+            EqualRiskContributionPortfolio([stocks["AAA"], stocks["DD"]]),
+            RiskParityPortfolio([stocks["BB"], stocks["CCCC"]], window=20, periodicity=3),
+        ],
+        volatility_target=0.1,
+    )
+
+
+@pytest.mark.parametrize("build", [all_weather, ewma, erc, mixed])
+def test_appending_bars_matches_optimize_on_the_full_history(stocks, build, tmp_path):
+    full = stocks(CALENDARS)
+    partial = {
+        symbol: Stock(symbol, source="fake", data=stock.data[stock.data.index < CUT])
+        for symbol, stock in full.items()
+    }
+
+    state = LiveState.from_portfolio(build(partial), fingerprint="settings")
+    state.save(tmp_path / "state.pkl")
+    state = LiveState.load(tmp_path / "state.pkl")
+    assert state.fingerprint == "settings"
+
+    new_bars = pd.concat(
+        {symbol: stock.price[stock.price.index >= CUT] for symbol, stock in full.items()},
+        axis=1,
+        sort=True,
+    )
+    assert state.append(new_bars) == len(new_bars)
+    # Bars already seen are skipped.
+    assert state.append(new_bars) == 0
+
+    portfolio = build(full)
+    expected = {name: w["weight"] for name, w in portfolio.optimize().items()}
+    actual = state.weights()
+    assert state.last_date == portfolio.asset_df.index[-1]
+    assert sorted(actual) == sorted(expected)
+    for name in expected:
+        assert np.isclose(actual[name], expected[name], rtol=1e-6), name
@@ -0,0 +1,68 @@
+import types
+
+import numpy as np
+import pandas as pd
+
+from util.panel import PricePanel
+
+
+def asset(symbol, index, seed):
+    rng = np.random.default_rng(seed)
+    prices = 100 * np.cumprod(1 + rng.normal(0.0, 0.01, len(index)))
+    return types.SimpleNamespace(
+        symbol=symbol, price=pd.Series(prices, index=index)
+    )
+
+
+def ragged_panel():
+    weekdays = pd.bdate_range("2020-01-01", "2020-06-30")
+    every_day = pd.date_range("2020-02-01", "2020-06-30")
+    late = pd.bdate_range("2020-03-02", "2020-05-29")
+    return PricePanel(
+        [
+            asset("A", weekdays, 0),
+            asset("B", weekdays[::2], 1),
+            asset("C", every_day, 2),
+            asset("D", late, 3),
+        ]
+    )
+
+
+def test_view_returns_match_returns_on_its_own_calendar():
+    panel = ragged_panel()
+    for symbols in (["A", "B"], ["B", "D"], ["A", "C", "D"], ["D"]):
+        view = panel.view(symbols)
+        frame = pd.DataFrame(
+            {symbol: panel.assets[symbol].price for symbol in symbols}
+        )
+        index = frame.index
+        assert index.equals(view.index)
+
+        # Forward filled within each asset's own dates only.
+        expected = frame.ffill()
+        for symbol in symbols:
+            last = panel.assets[symbol].price.index[-1]
+            expected.loc[index > last, symbol] = np.nan
+        np.testing.assert_array_equal(view.values, expected.to_numpy())
+
+        returns = np.full(expected.shape, np.nan)
+        returns[1:] = expected.to_numpy()[1:] / expected.to_numpy()[:-1] - 1
+        np.testing.assert_allclose(view.returns(), returns, rtol=1e-12)
+        np.testing.assert_allclose(
+            view.returns(3, 10, view.indices(symbols[::-1])),
+            returns[3:10, ::-1],
+            rtol=1e-12,
+        )
+
+        firsts = [index.get_loc(panel.assets[s].price.index[0]) for s in symbols]
+        np.testing.assert_array_equal(view.starts, firsts)
+
+
+def test_views_hold_no_copy_of_the_prices():
+    panel = ragged_panel()
+    view = panel.view(["A", "B"])
+    assert panel.view(["A", "B"]) is view
+    assert not any(
+        isinstance(value, np.ndarray) and value.ndim == 2
+        for value in vars(view).values()
+    )
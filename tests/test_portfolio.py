@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+
+from util.EqualWeightPortfolio import EqualWeightPortfolio
+
+WEEKDAYS = pd.bdate_range("2020-01-01", "2020-12-31")
+CALENDARS = {"AAA": WEEKDAYS, "BB": WEEKDAYS[100:]}
+
+
+def test_vol_target_scaling_without_any_variance_gives_no_weights(stocks):
+    stocks = stocks(CALENDARS)
+    portfolio = EqualWeightPortfolio(
+        [stocks["AAA"], stocks["BB"]], volatility_target=0.1
+    )
+    assert portfolio.optimize(as_of_date=WEEKDAYS[1]) == {}
+
+
+def test_vol_target_scaling_leaves_out_assets_without_a_variance(stocks):
+    stocks = stocks(CALENDARS)
+    portfolio = EqualWeightPortfolio(
+        [stocks["AAA"], stocks["BB"]], volatility_target=0.1
+    )
+    as_of_date = WEEKDAYS[50]
+    weights = portfolio.optimize(as_of_date=as_of_date)
+    assert list(weights) == ["AAA"]
+
+    returns = portfolio.asset_df["AAA"][:as_of_date].pct_change().tail(60)
+    variance = returns.var() * 252 * weights["AAA"]["weight"] ** 2
+    assert np.isclose(variance, 0.1 ** 2)
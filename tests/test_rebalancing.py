@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from util import rebalancing
+
+
+def reference(returns, targets, scheduled, cost_rate, band):
+    """rebalancing.simulate, one date at a time."""
+    returns = np.nan_to_num(returns, nan=0.0)
+    n_dates, n_assets = returns.shape
+    gross = np.full(n_dates, np.nan)
+    turnover = np.full(n_dates, np.nan)
+    weights = np.full((n_dates, n_assets), np.nan)
+
+    target = None
+    held = None
+    for t in range(n_dates):
+        if not np.isnan(targets[t]).all():
+            target = np.nan_to_num(targets[t], nan=0.0)
+        if held is None:
+            if target is not None:
+                held = target.copy()
+                turnover[t] = np.abs(held).sum()
+                weights[t] = held
+            continue
+
+        positions = held * (1.0 + returns[t])
+        value = 1.0 - held.sum() + positions.sum()
+        gross[t - 1] = value - 1.0
+        drifted = positions / value
+        if band is None:
+            trade = scheduled[t]
+        else:
+            trade = np.abs(drifted - target).max() > band
+        turnover[t] = np.abs(target - drifted).sum() if trade else 0.0
+        held = target.copy() if trade else drifted
+        weights[t] = held
+
+    costs = turnover * cost_rate
+    return {
+        "returns": (1.0 + gross) * (1.0 - costs) - 1.0,
+        "gross_returns": gross,
+        "turnover": turnover,
+        "weights": weights,
+    }
+
+
+def inputs():
+    rng = np.random.default_rng(3)
+    n_dates = 400
+    returns = rng.normal(0.0003, 0.015, (n_dates, 3))
+    returns[5:9, 1] = np.nan
+    scheduled = np.zeros(n_dates, dtype=bool)
+    scheduled[10::20] = True
+    targets = np.full((n_dates, 3), np.nan)
+    targets[scheduled] = rng.dirichlet(np.ones(3), scheduled.sum()) * 0.9
+    targets[scheduled, 2] = np.where(
+        np.arange(scheduled.sum()) % 4 == 0, np.nan, targets[scheduled, 2]
+    )
+    return returns, targets, scheduled
+
+
+@pytest.mark.parametrize("band", [None, 0.01, 0.05, 1.0])
+@pytest.mark.parametrize("block", [1, 7, 63])
+def test_simulate_matches_a_daily_loop(band, block):
+    returns, targets, scheduled = inputs()
+    result = rebalancing.simulate(
+        returns, targets, scheduled, trading_cost=0.001, slippage=0.0005,
+        band=band, block=block,
+    )
+    expected = reference(returns, targets, scheduled, 0.0015, band)
+    for key, values in expected.items():
+        np.testing.assert_allclose(
+            result[key], values, rtol=1e-10, atol=1e-14, equal_nan=True,
+            err_msg=key,
+        )
+
+
+def test_simulate_without_costs_or_drift_earns_the_weighted_returns():
+    returns, targets, _ = inputs()
+    targets = np.tile([0.5, 0.3, 0.2], (len(returns), 1))
+    scheduled = np.ones(len(returns), dtype=bool)
+    result = rebalancing.simulate(returns, targets, scheduled)
+
+    expected = np.nan_to_num(returns[1:], nan=0.0) @ [0.5, 0.3, 0.2]
+    np.testing.assert_allclose(result["returns"][:-1], expected, atol=1e-14)
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from util.EqualWeightPortfolio import EqualWeightPortfolio
+from util.RiskParityPortfolio import RiskParityPortfolio
+
+WEEKDAYS = pd.bdate_range("2018-01-01", "2020-12-31")
+CALENDARS = {
+    "AAA": WEEKDAYS,
+    "BB": WEEKDAYS,
+    "CCC": WEEKDAYS[150:],  # starts late
+    "DD": WEEKDAYS,
+}
+
+
+def joined_covariance(portfolio, as_of_date, window, periodicity):
+    """Covariance of the sub-portfolios' one-indexed synthetic returns,
+    joined and differenced.
+    """
+    indexed = [
+        portfolio.create_synthetic_returns(sub, as_of_date)
+        for sub in portfolio.assets
+    ]
+    joined = indexed[0]
+    for i in range(1, len(indexed)):
+        joined = joined.join(indexed[i], rsuffix="_%d" % i)
+    returns = joined.pct_change(periodicity, fill_method=None).iloc[::periodicity]
+    return returns.tail(window).cov() * (252.0 / periodicity)
+
+
+@pytest.mark.parametrize("window, periodicity", [(30, 1), (10, 3)])
+def test_portfolio_covariance_matches_joined_synthetic_returns(
+    stocks, window, periodicity
+):
+    stocks = stocks(CALENDARS)
+    portfolio = EqualWeightPortfolio(
+        [
+            RiskParityPortfolio([stocks["AAA"], stocks["CCC"]], window=20),
+            RiskParityPortfolio([stocks["BB"], stocks["DD"]], window=20),
+        ]
+    )
+    late = WEEKDAYS.get_loc(CALENDARS["CCC"][0])
+    # Dates while the late starter's returns fill the window, and after.
+    positions = list(range(late + 25, late + 40)) + [late + 120, len(WEEKDAYS) - 1]
+    for position in positions:
+        as_of_date = WEEKDAYS[position]
+        expected = joined_covariance(portfolio, as_of_date, window, periodicity)
+        actual = portfolio.covariance_matrix(
+            use_portfolios_only=True,
+            window=window,
+            periodicity=periodicity,
+            as_of_date=as_of_date,
+        )
+        np.testing.assert_allclose(
+            actual.to_numpy(), expected.to_numpy(), rtol=1e-10
+        )
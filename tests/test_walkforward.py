@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+
+from util.walkforward import walk_forward
+
+
+def returns(values):
+    index = pd.date_range("2020-01-01", periods=len(values), freq="B")
+    return pd.Series(values, index=index)
+
+
+def test_drawdown_counts_a_loss_on_the_first_return():
+    results = walk_forward(returns([-0.1, 0.05, 0.01, 0.02]), [0], [3])
+    drawdown = results["Max Drawdown"].iloc[0, 0]
+    assert np.isclose(drawdown, -0.1)
+
+
+def test_drawdown_matches_a_direct_computation():
+    rng = np.random.default_rng(0)
+    values = rng.normal(0.0, 0.02, 60)
+    starts, horizons = [0, 7, 30], [5, 20]
+    results = walk_forward(returns(values), starts, horizons)
+
+    for start in starts:
+        for horizon in horizons:
+            growth = np.cumprod(1.0 + values[start:start + horizon])
+            peaks = np.maximum.accumulate(np.concatenate([[1.0], growth]))[1:]
+            expected = (growth / peaks - 1.0).min()
+            actual = results["Max Drawdown"].loc[
+                results["Max Drawdown"].index[starts.index(start)], horizon
+            ]
+            assert np.isclose(actual, expected)
@@ -0,0 +1,225 @@
+"""EqualRiskContributionPortfolio object. Optimizes weights so that every
+asset contributes the same amount of risk to the portfolio, accounting for
+correlations through the covariance matrix – unlike RiskParityPortfolio,
+which only uses each asset's own volatility.
+"""
+
+import numpy as np
+import pandas as pd
+from .portfolio import Portfolio
+from .memo import memoize_optimize
+from .profiler import profiled
+
+
+def solve_erc(covariances, x0=None, tolerance=1e-10, max_iterations=500):
+    """Equal risk contribution weights by cyclical coordinate descent.
+
+    Minimizes 0.5 * x'Cx - sum(ln x_i) / n one coordinate at a time; each
+    coordinate has a closed form solution, and at the optimum every
+    x_i * (Cx)_i is equal. Assets with a NaN variance get zero weight, and
+    NaN covariances between the rest are treated as zero.
+
+    @param covariances: numpy array, assets x assets, or dates x assets x
+    assets to solve many dates at once
+    @param x0: numpy array of starting weights, same leading shape minus
+    the last axis, e.g. the previous rebalance's solution. Defaults to
+    inverse-volatility weights.
+    @param tolerance: float, stop once no weight moves more than this
+    (relative to the largest weight)
+    @param max_iterations: int, full sweeps over the assets
+    @return: numpy array of weights summing to 1 (NaN where no asset has a
+    variance)
+    """
+    covariances = np.array(covariances, dtype=float)
+    single = covariances.ndim == 2
+    if single:
+        covariances = covariances[None]
+    n = covariances.shape[-1]
+
+    variances = np.diagonal(covariances, axis1=1, axis2=2)
+    valid = ~np.isnan(variances)
+    covariances = np.nan_to_num(covariances, nan=0.0)
+    # Unit variance and zero budget pins excluded assets at zero weight.
+    diagonal = np.where(valid, variances, 1.0)
+    covariances[:, np.arange(n), np.arange(n)] = diagonal
+    covariances *= (valid[:, :, None] & valid[:, None, :]) | np.eye(n, dtype=bool)
+    budgets = valid / np.maximum(valid.sum(axis=1, keepdims=True), 1)
+
+    if x0 is None:
+        x = np.where(valid, 1.0 / np.sqrt(diagonal), 0.0)
+    else:
+        x = np.where(valid, np.nan_to_num(np.abs(x0), nan=0.0), 0.0)
+        if single:
+            x = x.reshape(1, n)
+        # Fall back to inverse volatility where no usable start was given.
+        empty = ~(x > 0).any(axis=1)
+        x[empty] = np.where(valid[empty], 1.0 / np.sqrt(diagonal[empty]), 0.0)
+
+    # The optimum satisfies x'Cx = sum(budgets), so start on that scale.
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scale = np.sqrt(
+            budgets.sum(axis=1) / np.einsum("di,dij,dj->d", x, covariances, x)
+        )
+    x *= np.nan_to_num(scale, nan=0.0, posinf=0.0)[:, None]
+
+    for _ in range(max_iterations):
+        previous = x.copy()
+        for i in range(n):
+            a = covariances[:, i, i]
+            c = np.einsum("dj,dj->d", covariances[:, i, :], x) - a * x[:, i]
+            x[:, i] = (-c + np.sqrt(c ** 2 + 4 * a * budgets[:, i])) / (2 * a)
+
+        change = np.abs(x - previous).max(axis=1)
+        largest = np.maximum(np.abs(x).max(axis=1), 1e-300)
+        if (change <= tolerance * largest).all():
+            break
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        weights = x / x.sum(axis=1, keepdims=True)
+    weights[~valid] = np.nan
+
+    return weights[0] if single else weights
+
+
+def scale_to_volatility_target(covariances, weights, volatility_target=None):
+    """Scales weights so the portfolio variance w'Cw hits the target.
+
+    @param covariances: numpy array, dates x assets x assets
+    @param weights: numpy array, dates x assets
+    @param volatility_target: float, in variance terms. None leaves the
+    weights as they are.
+    @return: (weights, variance contributions), both dates x assets
+    """
+    covariances = np.nan_to_num(covariances, nan=0.0)
+    filled = np.nan_to_num(weights, nan=0.0)
+
+    if volatility_target:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            portfolio_vol = np.einsum("di,dij,dj->d", filled, covariances, filled)
+            vol_scale = np.sqrt(volatility_target / portfolio_vol)
+        weights = weights * vol_scale[:, None]
+        filled = np.nan_to_num(weights, nan=0.0)
+
+    vol_contributions = filled * np.einsum("dij,dj->di", covariances, filled)
+    vol_contributions[np.isnan(weights)] = np.nan
+    return weights, vol_contributions
+
+
+class EqualRiskContributionPortfolio(Portfolio):
+    """Optimizes weights so that each asset's contribution to portfolio
+    variance, w_i * (Cw)_i, is the same. Each solve is warm started from the
+    previous one, which is usually a few iterations away when solving
+    consecutive rebalances.
+    """
+
+    def __init__(
+        self,
+        assets,
+        window=60,
+        periodicity=1,
+        volatility_target=0.1,
+        tolerance=1e-10,
+        max_iterations=500,
+        panel=None,
+    ):
+        has_portfolio_objs = any([isinstance(a, Portfolio) for a in assets])
+        if has_portfolio_objs:
+            raise ValueError(
+                "EqualRiskContributionPortfolio can not "
+                "accept Portfolio in param `assets`."
+            )
+
+        super(EqualRiskContributionPortfolio, self).__init__(
+            assets,
+            window=window,
+            periodicity=periodicity,
+            volatility_target=volatility_target,
+            panel=panel,
+        )
+        self.tolerance = tolerance
+        self.max_iterations = max_iterations
+        self._last_weights = None
+
+    def _cache_params(self) -> tuple:
+        return super(EqualRiskContributionPortfolio, self)._cache_params() + (
+            self.tolerance,
+            self.max_iterations,
+        )
+
+    def first_valid_date(self):
+        """First date any asset has a variance."""
+        dates = [date for date in self.first_valid_dates().values() if date]
+        return min(dates) if dates else None
+
+    def covariance_stack(self, dates) -> np.ndarray:
+        """Annualized covariance of the assets as of every date, dates x
+        assets x assets.
+        """
+        symbols = [asset.symbol for asset in self.assets]
+        covariances = self.rolling_covariance(self.periodicity)
+        return np.stack([
+            covariances.covariance(
+                as_of_date=date, window=self.window, symbols=symbols
+            )
+            for date in dates
+        ]) * (252.0 / self.periodicity)
+
+    @memoize_optimize
+    @profiled()
+    def optimize(self, as_of_date=None):
+        """Solves for equal risk contribution weights.
+
+        @param as_of_date: datetime object
+        @return: {asset_name: {"asset": Asset, "weight": float,
+        "vol_contribution": float}}
+        """
+        covariances = self.covariance_stack([as_of_date])
+        weights = solve_erc(
+            covariances,
+            x0=self._last_weights,
+            tolerance=self.tolerance,
+            max_iterations=self.max_iterations,
+        )
+        if not np.isnan(weights).all():
+            self._last_weights = weights
+
+        weights, vol_contributions = self._scale(covariances, weights)
+
+        # Put it in return format. Assets without enough history are left
+        # out.
+        allocations: dict = {}
+        for i, curr_asset in enumerate(self.assets):
+            if np.isnan(weights[0, i]):
+                continue
+            allocations[curr_asset.name] = {
+                "asset": curr_asset,
+                "weight": weights[0, i],
+                "vol_contribution": vol_contributions[0, i],
+            }
+
+        return allocations
+
+    @profiled()
+    def optimize_many(self, dates) -> pd.DataFrame:
+        """Solves every date in one batched solve.
+
+        @param dates: list-like of datetime objects
+        @return: pandas DataFrame of weights, dates x asset names
+        """
+        dates = pd.DatetimeIndex(dates)
+        covariances = self.covariance_stack(dates)
+        weights = solve_erc(
+            covariances, tolerance=self.tolerance, max_iterations=self.max_iterations
+        )
+        weights, _ = self._scale(covariances, weights)
+        return pd.DataFrame(
+            weights, index=dates, columns=[asset.name for asset in self.assets]
+        )
+
+    def _scale(self, covariances, weights):
+        """Applies the vol target. Returns (weights, variance contributions),
+        both dates x assets.
+        """
+        return scale_to_volatility_target(
+            covariances, weights, self.volatility_target
+        )
@@ -1,17 +1,47 @@
 """EqualWeightPortfolio object definition.
 """
 
+import collections
+
 from .portfolio import Portfolio
+from .memo import memoize_optimize
+from .profiler import profiled
 
 
 class EqualWeightPortfolio(Portfolio):
     """Creates uniform weights across given assets."""
 
-    def __init__(self, assets, volatility_target=None):
+    def __init__(self, assets, volatility_target=None, panel=None):
         super(EqualWeightPortfolio, self).__init__(
-            assets, volatility_target=volatility_target
+            assets, volatility_target=volatility_target, panel=panel
         )
 
+    def static_weights(self):
+        """Without a vol target, the weights are the same on every date as
+        long as every sub-portfolio's are too.
+
+        @return: {symbol: weight} or None
+        """
+        if self.volatility_target:
+            return None
+
+        # Same arithmetic as collapse_weights, so the weights match
+        # optimize's exactly.
+        weight = 1.0 / len(self.assets)
+        combined_weights = collections.defaultdict(lambda: 0)
+        for item in self.assets:
+            if isinstance(item, Portfolio):
+                portfolio_weights = item.static_weights()
+                if portfolio_weights is None:
+                    return None
+                for symbol in portfolio_weights:
+                    combined_weights[symbol] += weight * portfolio_weights[symbol]
+            else:
+                combined_weights[item.symbol] += weight
+        return dict(combined_weights)
+
+    @memoize_optimize
+    @profiled()
     def optimize(self, as_of_date=None):
         """
         @param as_of_date: datetime object
@@ -0,0 +1,80 @@
+import os
+import pandas as pd
+from .engine import Engine
+
+DATE_COLUMN = "Date"
+EXTENSIONS = (".parquet", ".csv")
+
+
+class LocalEngine(Engine):
+    """Serves prices from a directory of `<symbol>.parquet` or `<symbol>.csv`
+    files, e.g. a PriceCache folder such as `.price_cache/yahoo`. Files need
+    a date index (or a "Date" column) and the price columns named in
+    `config`. Only those columns are read from disk.
+    """
+    config = {
+        "stock": {
+            'price': ['Adj Close', 'Close']
+        }
+    }
+
+    directory = os.environ.get("ALL_WEATHER_DATA_DIR", "data")
+
+    # A missing or malformed file won't fix itself on retry.
+    retry_exceptions = ()
+
+    @classmethod
+    def set_directory(cls, directory):
+        cls.directory = directory
+
+    @classmethod
+    def path(cls, symbol) -> str:
+        for extension in EXTENSIONS:
+            path = os.path.join(cls.directory, symbol + extension)
+            if os.path.exists(path):
+                return path
+
+        raise FileNotFoundError(
+            "No data file for {} in {}. Expected one of: {}".format(
+                symbol, cls.directory, ", ".join(EXTENSIONS)
+            )
+        )
+
+    @classmethod
+    def get(cls, symbol, **kwargs):
+        path = cls.path(symbol)
+        wanted = set(cls.fields() + [DATE_COLUMN])
+
+        if path.endswith(".parquet"):
+            df = cls._read_parquet(path, wanted)
+        else:
+            df = pd.read_csv(
+                path, usecols=lambda column: column in wanted,
+                index_col=DATE_COLUMN, parse_dates=True
+            )
+
+        if DATE_COLUMN in df.columns:
+            df = df.set_index(DATE_COLUMN)
+        df.index = pd.to_datetime(df.index)
+        df = df.sort_index()
+
+        start = kwargs.get('start')
+        end = kwargs.get('end')
+        if start:
+            df = df[df.index >= start]
+        if end:
+            df = df[df.index <= end]
+        return df
+
+    @staticmethod
+    def _read_parquet(path, wanted) -> pd.DataFrame:
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            # No schema access without pyarrow, so read everything and
+            # project afterwards.
+            df = pd.read_parquet(path)
+            return df[[c for c in df.columns if c in wanted]]
+
+        columns = [c for c in pq.read_schema(path).names if c in wanted]
+        return pd.read_parquet(path, columns=columns)
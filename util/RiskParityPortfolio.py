@@ -5,11 +5,25 @@ EqualRiskContributionPortfolio.
 """
 
 import pdb
-from typing import List
 import numpy as np
 import pandas as pd
-from .asset import Asset
 from .portfolio import Portfolio
+from .memo import memoize_optimize
+from .profiler import profiled
+
+
+def inverse_volatility_weights(vols) -> np.ndarray:
+    """Weights proportional to 1 / stddev, summing to 1 per row.
+
+    @param vols: numpy array of variances, dates x assets
+    @return: numpy array, dates x assets. NaN where the variance is NaN.
+    """
+    has_vol = ~np.isnan(vols)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        std_inv = np.where(has_vol, 1.0 / np.sqrt(vols), 0.0)
+        weights = std_inv / std_inv.sum(axis=1, keepdims=True)
+    weights[~has_vol] = np.nan
+    return weights
 
 
 class RiskParityPortfolio(Portfolio):
@@ -19,7 +33,22 @@ class RiskParityPortfolio(Portfolio):
     EqualRiskContributionPortfolio.
     """
 
-    def __init__(self, assets, window=60, periodicity=1, volatility_target=0.1):
+    def __init__(
+        self,
+        assets,
+        window=60,
+        periodicity=1,
+        volatility_target=0.1,
+        panel=None,
+        estimator="rolling",
+        halflife=None,
+    ):
+        """
+        @param estimator: "rolling" for each asset's variance over the last
+        `window` returns blended with its expanding mean, as in
+        Asset.last_volatility, or "ewma" for its exponentially weighted
+        variance with the given halflife
+        """
         has_portfolio_objs = any([isinstance(a, Portfolio) for a in assets])
         if has_portfolio_objs:
             raise ValueError(
@@ -31,84 +60,120 @@ class RiskParityPortfolio(Portfolio):
             window=window,
             periodicity=periodicity,
             volatility_target=volatility_target,
+            panel=panel,
+            estimator=estimator,
+            halflife=halflife,
         )
 
+    @memoize_optimize
+    @profiled()
     def optimize(self, as_of_date=None):
-        """Solves for inverse-volatility weights.
+        """Solves for inverse-volatility weights. A single-date view of
+        optimize_many.
 
         @param as_of_date: datetime object
         @return: {asset_name: {"asset": Asset, "weight": float}}
         """
+        dates = None if as_of_date is None else [as_of_date]
+        vols, weights = self._solve(dates)
+        vol_contributions = (weights ** 2) * vols
 
-        most_recent_vols: List[float] = [
-            asset.last_volatility(
-                window=self.window, periodicity=self.periodicity, as_of_date=as_of_date
+        # Put it in return format. Assets without a volatility yet are left
+        # out.
+        allocations: dict = {}
+        for i, curr_asset in enumerate(self.assets):
+            if np.isnan(weights[0, i]):
+                continue
+            allocations[curr_asset.name] = {
+                "asset": curr_asset,
+                "weight": weights[0, i],
+                "vol_contribution": vol_contributions[0, i],
+            }
+
+        return allocations
+
+    @profiled()
+    def optimize_many(self, dates) -> pd.DataFrame:
+        """Solves for inverse-volatility weights at every date at once.
+
+        @param dates: list-like of datetime objects
+        @return: pandas DataFrame of weights, dates x asset names. Assets
+        without a volatility as of a date are NaN.
+        """
+        dates = pd.DatetimeIndex(dates)
+        _, weights = self._solve(dates)
+        return pd.DataFrame(
+            weights, index=dates, columns=[asset.name for asset in self.assets]
+        )
+
+    def first_valid_date(self):
+        """First date any asset has a volatility."""
+        dates = [
+            asset.first_valid_date(
+                window=self.window,
+                periodicity=self.periodicity,
+                estimator=self.estimator,
+                halflife=self.halflife,
             )
             for asset in self.assets
         ]
+        dates = [date for date in dates if date is not None]
+        return min(dates) if dates else None
+
+    def volatility_matrix(self, dates=None) -> np.ndarray:
+        """Variance of every asset as of every date, dates x assets."""
+        return np.column_stack([
+            asset.volatility_at(
+                dates,
+                window=self.window,
+                periodicity=self.periodicity,
+                estimator=self.estimator,
+                halflife=self.halflife,
+            )
+            for asset in self.assets
+        ])
 
-        asset_df = pd.DataFrame([self.assets, most_recent_vols]).T
-        asset_df.columns = ["asset", "vol"]
-        asset_df = asset_df.dropna().reset_index()  # get rid of None vols
-
-        weights_i: List[float] = []
-        std_inv = 1.0 / np.sqrt(asset_df["vol"].astype(float))
-        weights_i = list(std_inv / std_inv.sum())
-
-        asset_df["weights"] = pd.Series(weights_i)
+    def _solve(self, dates=None):
+        """Returns (variances, weights), both dates x assets."""
+        vols = self.volatility_matrix(dates)
+        has_vol = ~np.isnan(vols)
+        weights = inverse_volatility_weights(vols)
 
         # Make sure that volatility contributions are all the same.
         try:
-            vol_contributions = (asset_df["weights"] ** 2) * asset_df["vol"]
-            for i in range(1, len(vol_contributions)):
-                diff = abs(vol_contributions[0] - vol_contributions[i])
-                assert diff <= 1e-4
+            vol_contributions = (weights ** 2) * vols
+            self._check_equal_contributions(vol_contributions)
         except AssertionError:
             pdb.set_trace()
 
-        # Put it in return format.
-        allocations: dict = {}
-        for i in range(len(asset_df)):
-            curr_asset: Asset = asset_df["asset"].iloc[i]
-            weight = asset_df["weights"].iloc[i]
-            vol_cont = (weight ** 2) * asset_df["vol"].iloc[i]
-            allocations[curr_asset.name] = {
-                "asset": curr_asset,
-                "weight": weight,
-                "vol_contribution": vol_cont,
-            }
-
         if self.volatility_target:
             # Scale to vol target.
-            vol_contributions = [
-                allocations[name]["vol_contribution"] for name in allocations
-            ]
-            portfolio_vol = np.sum(vol_contributions)
-            vol_scale = np.sqrt(self.volatility_target / portfolio_vol)
-            for name in allocations:
-                allocations[name]["weight"] = allocations[name]["weight"] * vol_scale
-
-            # Update vol contributions.
-            asset_df["name"] = asset_df["asset"].apply(lambda x: x.name)
-            for name in allocations:
-                weight = allocations[name]["weight"]
-                vol_cont = (weight ** 2) * asset_df[asset_df["name"] == name][
-                    "vol"
-                ].iloc[0]
-                allocations[name]["vol_contribution"] = vol_cont
+            with np.errstate(divide="ignore", invalid="ignore"):
+                portfolio_vol = np.nansum(vol_contributions, axis=1, keepdims=True)
+                vol_scale = np.sqrt(self.volatility_target / portfolio_vol)
+                weights = weights * vol_scale
 
             # Check that everything is right.
-            vol_contributions = [
-                allocations[name]["vol_contribution"] for name in allocations
-            ]
+            vol_contributions = (weights ** 2) * vols
             try:
-                diff = abs(np.sum(vol_contributions) - self.volatility_target)
-                assert diff <= 1e-4
-
-                for i in range(1, len(vol_contributions)):
-                    diff = abs(vol_contributions[0] - vol_contributions[i])
-                    assert diff <= 1e-4
+                solved = has_vol.any(axis=1)
+                diff = np.abs(
+                    np.nansum(vol_contributions[solved], axis=1)
+                    - self.volatility_target
+                )
+                assert (diff <= 1e-4).all()
+
+                self._check_equal_contributions(vol_contributions)
             except AssertionError:
                 pdb.set_trace()
 
-        return allocations
+        return vols, weights
+
+    @staticmethod
+    def _check_equal_contributions(vol_contributions):
+        solved = ~np.isnan(vol_contributions).all(axis=1)
+        if not solved.any():
+            return
+        contributions = vol_contributions[solved]
+        diff = np.nanmax(contributions, axis=1) - np.nanmin(contributions, axis=1)
+        assert (diff <= 1e-4).all()
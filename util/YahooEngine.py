@@ -1,7 +1,13 @@
 import datetime
-from .engine import Engine
+import pandas as pd
+from .engine import Engine, NoDataError
 import yfinance
 
+try:
+    from yfinance.exceptions import YFRateLimitError
+except ImportError:  # yfinance before 0.2.54
+    YFRateLimitError = NoDataError
+
 
 class YahooEngine(Engine):
     config = {
@@ -10,6 +16,8 @@ class YahooEngine(Engine):
         }
     }
 
+    retry_exceptions = Engine.retry_exceptions + (YFRateLimitError,)
+
     @staticmethod
     def get(symbol, **kwargs):
         start_date_str = datetime.datetime(1850, 1, 1).strftime("%Y-%m-%d")
@@ -17,6 +25,22 @@ class YahooEngine(Engine):
         start = kwargs.get('start', start_date_str)
         end = kwargs.get('end', today_str)
 
-        df = yfinance.download(symbol, period="max")
+        if 'start' in kwargs:
+            # Only download what was asked for, e.g. incremental refreshes
+            # of the price cache.
+            df = yfinance.download(symbol, start=start)
+        else:
+            df = yfinance.download(symbol, period="max")
+
+        # yfinance reports failed and rate-limited downloads by returning an
+        # empty frame rather than raising.
+        if df is None or df.empty:
+            raise NoDataError("No data returned for %s" % symbol)
+
+        # Newer yfinance versions return (field, ticker) columns even for a
+        # single symbol.
+        if isinstance(df.columns, pd.MultiIndex):
+            df.columns = df.columns.get_level_values(0)
+
         df = df[(df.index >= start) & (df.index <= end)]
         return df
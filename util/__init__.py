@@ -1,3 +1,4 @@
 from .RiskParityPortfolio import RiskParityPortfolio
 from .EqualWeightPortfolio import EqualWeightPortfolio
+from .EqualRiskContributionPortfolio import EqualRiskContributionPortfolio
 from .util import *
\ No newline at end of file
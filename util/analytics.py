@@ -0,0 +1,145 @@
+"""Vectorized performance analytics. Every function takes periodic returns
+as a pandas DataFrame (one column per strategy or variant) or Series and
+computes over all columns at once.
+"""
+
+import numpy as np
+import pandas as pd
+
+PERIODS_PER_YEAR = 252
+
+
+def _as_frame(returns) -> pd.DataFrame:
+    if isinstance(returns, pd.Series):
+        return returns.to_frame()
+    return returns
+
+
+def cumulative_index(returns) -> pd.DataFrame:
+    """Growth of 1 unit. Missing returns count as flat; values before a
+    column's first return stay NaN.
+    """
+    returns = _as_frame(returns)
+    values = returns.to_numpy(dtype=float)
+    started = np.maximum.accumulate(~np.isnan(values), axis=0)
+
+    index = np.cumprod(1.0 + np.nan_to_num(values, nan=0.0), axis=0)
+    index[~started] = np.nan
+    return pd.DataFrame(index, index=returns.index, columns=returns.columns)
+
+
+def annualized_return(returns, periods_per_year=PERIODS_PER_YEAR) -> pd.Series:
+    """Compound annual growth rate."""
+    returns = _as_frame(returns)
+    values = returns.to_numpy(dtype=float)
+    n = (~np.isnan(values)).sum(axis=0)
+    growth = np.prod(1.0 + np.nan_to_num(values, nan=0.0), axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cagr = growth ** (periods_per_year / n) - 1.0
+    return pd.Series(cagr, index=returns.columns)
+
+
+def annualized_volatility(returns, periods_per_year=PERIODS_PER_YEAR) -> pd.Series:
+    returns = _as_frame(returns)
+    vol = np.nanstd(returns.to_numpy(dtype=float), axis=0) * np.sqrt(periods_per_year)
+    return pd.Series(vol, index=returns.columns)
+
+
+def sharpe_ratio(returns, periods_per_year=PERIODS_PER_YEAR) -> pd.Series:
+    """Annualized Sharpe ratio with a zero risk-free rate, as in
+    util.print_annualized_sharpe.
+    """
+    returns = _as_frame(returns)
+    values = returns.to_numpy(dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sharpe = (
+            np.nanmean(values, axis=0) * periods_per_year
+            / (np.nanstd(values, axis=0) * np.sqrt(periods_per_year))
+        )
+    return pd.Series(sharpe, index=returns.columns)
+
+
+def sortino_ratio(returns, periods_per_year=PERIODS_PER_YEAR) -> pd.Series:
+    """Like sharpe_ratio, but only penalizes downside deviation."""
+    returns = _as_frame(returns)
+    values = returns.to_numpy(dtype=float)
+    downside = np.sqrt(np.nanmean(np.minimum(values, 0.0) ** 2, axis=0))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sortino = (
+            np.nanmean(values, axis=0) * periods_per_year
+            / (downside * np.sqrt(periods_per_year))
+        )
+    return pd.Series(sortino, index=returns.columns)
+
+
+def drawdowns(returns) -> pd.DataFrame:
+    """Percentage below the running peak of the cumulative index, the
+    starting 1 unit included.
+    """
+    index = cumulative_index(returns)
+    values = index.to_numpy()
+    peaks = np.fmax(np.fmax.accumulate(values, axis=0), 1.0)
+    return pd.DataFrame(values / peaks - 1.0, index=index.index, columns=index.columns)
+
+
+def max_drawdown(returns) -> pd.DataFrame:
+    """Deepest drawdown and the longest time spent below a previous peak.
+
+    @return: pandas DataFrame, columns x ["Max Drawdown", "Max Drawdown
+    Duration"], durations counted in periods
+    """
+    returns = _as_frame(returns)
+    drawdown = drawdowns(returns).to_numpy()
+
+    # Periods since the last peak: position minus position of the most
+    # recent row at its peak. The starting 1 unit is a peak one row before
+    # the first return.
+    positions = np.arange(len(drawdown))[:, None]
+    at_peak = ~(drawdown < 0)
+    last_peak = np.maximum.accumulate(np.where(at_peak, positions, -1), axis=0)
+    duration = positions - last_peak
+
+    return pd.DataFrame(
+        {
+            "Max Drawdown": np.nanmin(drawdown, axis=0),
+            "Max Drawdown Duration": duration.max(axis=0),
+        },
+        index=returns.columns,
+    )
+
+
+def rolling_volatility(returns, window=60, periods_per_year=PERIODS_PER_YEAR):
+    """Annualized rolling standard deviation of returns."""
+    returns = _as_frame(returns)
+    return returns.rolling(window).std() * np.sqrt(periods_per_year)
+
+
+def rolling_sharpe(returns, window=252, periods_per_year=PERIODS_PER_YEAR):
+    returns = _as_frame(returns)
+    rolling = returns.rolling(window)
+    return (rolling.mean() * periods_per_year) / (
+        rolling.std() * np.sqrt(periods_per_year)
+    )
+
+
+def calendar_year_returns(returns) -> pd.DataFrame:
+    """Compounded return of each calendar year, years x columns."""
+    returns = _as_frame(returns)
+    growth = np.log1p(returns).groupby(returns.index.year).sum(min_count=1)
+    growth.index.name = "Year"
+    return np.expm1(growth)
+
+
+def summary(returns, periods_per_year=PERIODS_PER_YEAR) -> pd.DataFrame:
+    """Table of the headline metrics, metrics x columns."""
+    returns = _as_frame(returns)
+    table = pd.DataFrame(
+        {
+            "CAGR": annualized_return(returns, periods_per_year),
+            "Volatility": annualized_volatility(returns, periods_per_year),
+            "Sharpe": sharpe_ratio(returns, periods_per_year),
+            "Sortino": sortino_ratio(returns, periods_per_year),
+        }
+    )
+    table = table.join(max_drawdown(returns))
+    return table.T
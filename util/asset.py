@@ -3,16 +3,25 @@ import abc
 import numpy as np
 import pandas as pd
 from .timeseries import TimeSeries
+from .ewma import EWMACovariance
+from .memo import OPTIMIZE_CACHE
+from .profiler import PROFILER, profiled
 
 
 class Asset(TimeSeries):
     __metaclass__ = abc.ABCMeta
 
-    def __init__(self, symbol, name, asset_type, source, interval='monthly'):
-        super(Asset, self).__init__(source)
+    def __init__(self, symbol, name, asset_type, source, interval='monthly',
+                 data=None, price_only=None, dtype=None):
+        super(Asset, self).__init__(source, price_only=price_only, dtype=dtype)
         self.name = name
         self.symbol = symbol
         self.asset_type = asset_type
+        if data is not None:
+            # Already fetched, e.g. by Stock.bulk_load.
+            self.set_data(data)
+            return
+
         try:
             self.get(symbol, interval=interval)
         except TypeError as e:
@@ -25,8 +34,38 @@ class Asset(TimeSeries):
         types_same = (self.asset_type == other.asset_type)
         return symbols_same and types_same
 
+    def clear_cache(self):
+        """Drops the memoized price and return series. TimeSeries calls this
+        whenever new data is loaded.
+        """
+        self._price = None
+        self._returns = None
+        self._vol_index = {}
+        # Memoized weights may have been computed from the old data.
+        OPTIMIZE_CACHE.clear()
+
+    @property
+    def price(self) -> pd.Series:
+        """Cleaned price series (zeros treated as missing, forward filled).
+        Computed once per load of self.data.
+        """
+        if self._price is None:
+            PROFILER.incr("price_cache_misses")
+            self._price = self._clean_price()
+        else:
+            PROFILER.incr("price_cache_hits")
+        return self._price
+
     @property
-    def price(self) -> pd.DataFrame:
+    def returns(self) -> pd.Series:
+        """Daily returns of self.price. Computed once per load of self.data.
+        """
+        if self._returns is None:
+            self._returns = self.price.pct_change()
+        return self._returns
+
+    @profiled("Asset.clean_price")
+    def _clean_price(self) -> pd.Series:
         price_field: Union[str, list] = \
             self.engine.config[self.asset_type]['price']
 
@@ -45,6 +84,7 @@ class Asset(TimeSeries):
         df = df.replace(0, np.nan).ffill()
         return df
 
+    @profiled("Asset.volatility")
     def volatility(self,
                    window=30,
                    periodicity=1,
@@ -52,39 +92,107 @@ class Asset(TimeSeries):
                    annualize=True) -> pd.Series:
         """Returns variance, not standard deviation.
         """
+        price: pd.Series = self.price
         if not as_of_date:
-            as_of_date: datetime.datetime = self.price.index[-1]
-
-        price: pd.Series = self.price[self.price.index <= as_of_date]
-
-        # ::per means to take every per-th row
-        pcts: pd.Series = price.pct_change(periodicity).iloc[::periodicity]
+            as_of_date: datetime.datetime = price.index[-1]
+
+        if periodicity == 1:
+            pcts: pd.Series = self.returns[self.returns.index <= as_of_date]
+        else:
+            price = price[price.index <= as_of_date]
+            # ::per means to take every per-th row
+            pcts = price.pct_change(periodicity).iloc[::periodicity]
         vol: pd.Series = pcts.rolling(window=window).std() ** 2
         if annualize:
             vol = vol * (252.0 / periodicity)
 
         return vol
 
+    def volatility_index(self, window=30, periodicity=1, annualize=True):
+        """Volatility statistics over the whole history, computed once per
+        (window, periodicity, annualize) and memoized until new data is
+        loaded. Rolling and expanding statistics are causal, so the values
+        up to any date equal those computed on history truncated there.
+
+        @return: (DatetimeIndex, variances, expanding means of variances)
+        """
+        key = (window, periodicity, annualize)
+        if key in self._vol_index:
+            PROFILER.incr("volatility_index_cache_hits")
+        else:
+            PROFILER.incr("volatility_index_cache_misses")
+            vol_series: pd.Series = self.volatility(
+                window=window, periodicity=periodicity, annualize=annualize
+            )
+            exp_mean = vol_series.expanding(min_periods=1).mean()
+            self._vol_index[key] = (
+                vol_series.index,
+                vol_series.to_numpy(dtype=float),
+                exp_mean.to_numpy(dtype=float),
+            )
+        return self._vol_index[key]
+
+    def ewma_volatility_index(self, halflife=30, periodicity=1, annualize=True):
+        """Exponentially weighted variances over the whole history, one
+        recursive update per return, memoized like volatility_index.
+
+        @return: (DatetimeIndex, variances)
+        """
+        key = ("ewma", halflife, periodicity, annualize)
+        if key in self._vol_index:
+            PROFILER.incr("volatility_index_cache_hits")
+        else:
+            PROFILER.incr("volatility_index_cache_misses")
+            if periodicity == 1:
+                pcts = self.returns
+            else:
+                pcts = self.price.pct_change(periodicity).iloc[::periodicity]
+            estimator = EWMACovariance(1, halflife)
+            vols = estimator.update_many(pcts.to_numpy(dtype=float)[:, None])[:, 0]
+            if annualize:
+                vols = vols * (252.0 / periodicity)
+            self._vol_index[key] = (pcts.index, vols)
+        return self._vol_index[key]
+
+    def first_valid_date(self, window=30, periodicity=1, estimator="rolling",
+                         halflife=None):
+        """First date with a volatility, i.e. the first as_of_date for which
+        last_volatility (or volatility_at with the given estimator) isn't
+        NaN. None if there never is one.
+        """
+        if estimator == "ewma":
+            dates, vols = self.ewma_volatility_index(
+                halflife=halflife, periodicity=periodicity
+            )
+        else:
+            dates, vols, _ = self.volatility_index(
+                window=window, periodicity=periodicity
+            )
+        valid = np.flatnonzero(~np.isnan(vols))
+        return dates[valid[0]] if len(valid) else None
+
+    @profiled("Asset.last_volatility")
     def last_volatility(self,
                         window=30,
                         periodicity=1,
                         as_of_date=None,
                         annualize=True,
                         average_with_expanding_mean=True) -> float:
-        vol_series: pd.Series = self.volatility(
-            window=window,
-            periodicity=periodicity,
-            as_of_date=as_of_date,
-            annualize=annualize
+        dates, vols, exp_means = self.volatility_index(
+            window=window, periodicity=periodicity, annualize=annualize
         )
 
-        if len(vol_series):
-            last_vol = vol_series.iloc[-1]
+        # Number of observations dated on or before as_of_date.
+        if as_of_date:
+            n = dates.searchsorted(as_of_date, side="right")
+        else:
+            n = len(dates)
 
-            if average_with_expanding_mean:
-                exp_mean = vol_series.expanding(min_periods=1).mean()
+        if n:
+            last_vol = vols[n - 1]
 
-                last_mean_vol = exp_mean.iloc[-1]
+            if average_with_expanding_mean:
+                last_mean_vol = exp_means[n - 1]
                 last_vol = np.mean([
                     # take sqrt to be in stddev terms
                     np.sqrt(last_vol), np.sqrt(last_mean_vol)
@@ -94,10 +202,54 @@ class Asset(TimeSeries):
 
         return None
 
+    @profiled("Asset.volatility_at")
+    def volatility_at(self,
+                      dates=None,
+                      window=30,
+                      periodicity=1,
+                      annualize=True,
+                      average_with_expanding_mean=True,
+                      estimator="rolling",
+                      halflife=None) -> np.ndarray:
+        """Vectorized last_volatility over many as-of dates. Dates before
+        the start of the history get NaN instead of None.
+
+        @param dates: list-like of datetimes, or None for just the latest
+        @param estimator: "rolling" for last_volatility's windowed variance,
+        or "ewma" for the exponentially weighted one with the given
+        halflife, which ignores window and the expanding mean
+        @return: numpy array, one variance per date
+        """
+        if estimator == "ewma":
+            index, vols = self.ewma_volatility_index(
+                halflife=halflife, periodicity=periodicity, annualize=annualize
+            )
+            average_with_expanding_mean = False
+        else:
+            index, vols, exp_means = self.volatility_index(
+                window=window, periodicity=periodicity, annualize=annualize
+            )
+
+        if dates is None:
+            n = np.array([len(index)])
+        else:
+            n = index.searchsorted(pd.DatetimeIndex(dates), side="right")
+
+        values = np.full(len(n), np.nan)
+        has_history = n > 0
+        last_vol = vols[n[has_history] - 1]
+        if average_with_expanding_mean:
+            last_mean_vol = exp_means[n[has_history] - 1]
+            last_vol = ((np.sqrt(last_vol) + np.sqrt(last_mean_vol)) / 2) ** 2
+        values[has_history] = last_vol
+
+        return values
+
     def momentum(self, window=30, as_of_date=None) -> pd.Series:
+        price: pd.Series = self.price
         if not as_of_date:
-            as_of_date = self.price.index[-1]
+            as_of_date = price.index[-1]
 
-        pcts = self.price[self.price.index <= as_of_date].pct_change(window)
+        pcts = price[price.index <= as_of_date].pct_change(window)
 
         return pcts
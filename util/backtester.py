@@ -4,7 +4,9 @@ import datetime
 import numpy as np
 import pandas as pd
 from . import util
+from . import rebalancing
 from .portfolio import Portfolio
+from .profiler import PROFILER, profiled
 
 SLIPPAGE = 0.005
 TRADING_COST = 0.0005
@@ -34,6 +36,12 @@ class SanityBacktester(object):
         self.leverage_ratios = []
         self.exposures = []
 
+        # Set by backtest: the daily returns it used, the weights it held
+        # (dates x symbols) and the dates it rebalanced on.
+        self.pcts = None
+        self.weights = None
+        self.rebalance_dates = []
+
         self.symbol_to_asset = {
             p.symbol: p for p in portfolio.tradeable_assets if isinstance
         }
@@ -57,6 +65,7 @@ class SanityBacktester(object):
         df.plot()
         return df
 
+    @profiled("SanityBacktester.backtest")
     def backtest(
         self,
         start_date: datetime.datetime,
@@ -84,69 +93,63 @@ class SanityBacktester(object):
         ########################
         pcts: pd.DataFrame = self.portfolio.asset_df.pct_change()
         pcts = pcts[(pcts.index >= start_date) & (pcts.index <= end_date)]
+        symbols = list(pcts.columns)
 
         ########################
         # Get simulated weights
         ########################
         all_dates = pcts.index[rebalance_period + 1 :]
-        rebalance_date: datetime.datetime = all_dates[0]
-
-        all_weights = []
-        last_weights = None
-
-        for date in all_dates:
-            if date >= rebalance_date:
-                try:
-                    logging.info("Rebalancing for date: %s" % str(date))
-                    weights = self.portfolio.optimize(date)
-
-                    # get total exposure
-                    exposures = [weights[name]["weight"] for name in weights]
-                    total_exposure = np.sum(exposures)
-                    self.exposures.append((date, total_exposure))
-                    logging.info("Net exposure: %0.3f" % total_exposure)
-
-                    # get leverage ratio
-                    leverage_ratio = np.sum([abs(exposure) for exposure in exposures])
-                    logging.info("Leverage ratio: %0.3f" % leverage_ratio)
-                    self.leverage_ratios.append((date, leverage_ratio))
-                except IndexError as e:
-                    msg = "Backtester.py: " + str(e)
-                    logging.debug(msg)
-                    rebalance_date = date
-                    continue
-
-                last_weights = weights
-                rebalance_date = rebalance_date + datetime.timedelta(rebalance_period)
-
-            curr_weights = {
-                last_weights[name]["asset"].symbol: last_weights[name]["weight"]
-                for name in last_weights
-            }
-            curr_weights["date"] = date
-            all_weights.append(curr_weights)
-
-        weights_df = pd.DataFrame(all_weights)
-        weights_df = weights_df.set_index("date")
+        # Skip straight to the first date the portfolio can be optimized,
+        # instead of retrying every date before it.
+        first_valid_date = self.portfolio.first_valid_date()
+        if first_valid_date is not None:
+            all_dates = all_dates[all_dates >= first_valid_date]
+        static_weights = self.portfolio.static_weights()
+        if first_valid_date is None or not len(all_dates):
+            has_weights = np.zeros(0, dtype=bool)
+        elif static_weights is not None:
+            # Weights never change, so there is nothing to optimize.
+            weights, has_weights, weighted_symbols = self._static_weights(
+                all_dates, symbols, static_weights, rebalance_period
+            )
+        else:
+            weights, has_weights, weighted_symbols = self._simulate_weights(
+                all_dates, symbols, rebalance_period
+            )
+        if not has_weights.any():
+            raise IndexError(
+                "Backtester.py: portfolio could not be optimized on any date "
+                "between %s and %s" % (start_date, end_date)
+            )
+        weighted_cols = [symbols.index(symbol) for symbol in weighted_symbols]
 
         ########################
         # Cull assets
         ########################
         if weight_threshold:
-            weights_df[weights_df.abs() < weight_threshold] = 0.0
+            with np.errstate(invalid="ignore"):
+                weights[np.abs(weights) < weight_threshold] = 0.0
             # TODO may want to think about distributing the spare
             # allocation to remaining assets
 
         if assets_to_include:
-            weights_columns = weights_df.columns
-            for symbol in weights_columns:
+            for symbol in weighted_symbols:
                 asset = self._get_asset_from_symbol(symbol)
                 if asset.name in assets_to_include:
                     continue
                 else:
-                    weights_df[symbol] = 0.0
+                    weights[has_weights, symbols.index(symbol)] = 0.0
+
+        self.pcts = pcts
+        self.weights = pd.DataFrame(weights, index=all_dates, columns=symbols)
 
         if debug_csv:
+            weights_df = pd.DataFrame(
+                weights[has_weights][:, weighted_cols],
+                index=all_dates[has_weights],
+                columns=weighted_symbols,
+            )
+            weights_df.index.name = "date"
             debug_df = pcts.copy()
             debug_df = debug_df.join(weights_df, rsuffix="_weights")
             debug_df.to_csv(debug_csv)
@@ -154,13 +157,168 @@ class SanityBacktester(object):
         ########################
         # Get simulated weighted returns
         ########################
-        weighted_pcts = pcts.copy().shift(-1)
-        weighted_pcts = weighted_pcts[weighted_pcts.index >= weights_df.index[0]]
-
-        weights_cols = set(weights_df.columns)
-        pcts_cols = set(weighted_pcts.columns)
-        cols_in_both = weights_cols.intersection(pcts_cols)
-        for col in cols_in_both:
-            weighted_pcts[col] = weighted_pcts[col] * weights_df[col]  # \
-            # * leverage_ratio
-        return weighted_pcts
+        # Weights set at the close of a date earn the next date's return.
+        # Dates that could not be optimized have no weights and yield NaN.
+        first = np.argmax(has_weights)
+        next_pcts = pcts.shift(-1)
+        next_pcts = next_pcts[next_pcts.index >= all_dates[first]]
+
+        weighted_values = next_pcts.to_numpy(dtype=float, copy=True)
+        weighted_values[:, weighted_cols] *= weights[first:][:, weighted_cols]
+        # * leverage_ratio
+        return pd.DataFrame(
+            weighted_values, index=next_pcts.index, columns=next_pcts.columns
+        )
+
+    @profiled("SanityBacktester.simulate_weights")
+    def _simulate_weights(self, all_dates, symbols, rebalance_period):
+        """Optimizes the portfolio on rebalance dates only and forward fills
+        the weights in between.
+
+        A rebalance that raises IndexError (e.g. not enough history yet) is
+        retried on the next date, and the failed date gets no weights.
+
+        @return: (dates x symbols weight array, NaN where unweighted;
+        boolean array of dates that have weights; symbols that received a
+        weight, in order of first appearance)
+        """
+        columns = {symbol: i for i, symbol in enumerate(symbols)}
+        weights = np.full((len(all_dates), len(symbols)), np.nan)
+        has_weights = np.zeros(len(all_dates), dtype=bool)
+        weighted_symbols = {}
+
+        rebalance_dates = []
+        rebalance_weights = []
+
+        rebalance_date: datetime.datetime = all_dates[0]
+        i = 0
+        while i < len(all_dates):
+            date = all_dates[i]
+            try:
+                logging.info("Rebalancing for date: %s" % str(date))
+                allocations = self.portfolio.optimize(date)
+            except IndexError as e:
+                msg = "Backtester.py: " + str(e)
+                logging.debug(msg)
+                PROFILER.incr("index_error_retries")
+                rebalance_date = date
+                i += 1
+                continue
+
+            row = np.full(len(symbols), np.nan)
+            for name in allocations:
+                symbol = allocations[name]["asset"].symbol
+                row[columns[symbol]] = allocations[name]["weight"]
+                weighted_symbols.setdefault(symbol, None)
+            rebalance_dates.append(date)
+            rebalance_weights.append(row)
+            PROFILER.incr("rebalances")
+
+            # Hold these weights until the first date on or after the next
+            # scheduled rebalance.
+            rebalance_date = rebalance_date + datetime.timedelta(rebalance_period)
+            next_i = max(all_dates.searchsorted(rebalance_date), i + 1)
+            weights[i:next_i] = row
+            has_weights[i:next_i] = True
+            i = next_i
+
+        if rebalance_weights:
+            self._record_exposures(rebalance_dates, np.array(rebalance_weights))
+        self.rebalance_dates = rebalance_dates
+
+        return weights, has_weights, list(weighted_symbols)
+
+    @profiled("SanityBacktester.simulate_drift")
+    def simulate_drift(self, band=None) -> pd.DataFrame:
+        """Replays the weights of the last backtest, letting holdings drift
+        between trades and charging trading_cost and slippage on turnover.
+        Uses the weights after weight_threshold and assets_to_include.
+
+        @param band: float or None. None trades to target on every
+        rebalance date; otherwise only when some weight drifts more than
+        `band` away from its target.
+        @return: pandas DataFrame with columns "Return" (net of costs),
+        "Gross Return", "Turnover" and "Cost", indexed like backtest's
+        result
+        """
+        if self.weights is None:
+            raise ValueError("Run backtest before simulate_drift.")
+
+        weights = self.weights.reindex(self.pcts.index)
+        scheduled = self.pcts.index.isin(self.rebalance_dates)
+        result = rebalancing.simulate(
+            self.pcts.to_numpy(dtype=float),
+            weights.to_numpy(dtype=float),
+            scheduled,
+            trading_cost=self.trading_cost,
+            slippage=self.slippage,
+            band=band,
+        )
+
+        df = pd.DataFrame(
+            {
+                "Return": result["returns"],
+                "Gross Return": result["gross_returns"],
+                "Turnover": result["turnover"],
+                "Cost": result["costs"],
+            },
+            index=self.pcts.index,
+        )
+        # Start from the first trade, as backtest starts from the first
+        # weights.
+        return df[~np.isnan(result["turnover"])]
+
+    def _static_weights(self, all_dates, symbols, static_weights,
+                        rebalance_period):
+        """_simulate_weights for portfolios whose weights are the same on
+        every date: one row repeated over all dates, without any optimize
+        calls. Rebalance dates follow the same schedule.
+        """
+        row = np.full(len(symbols), np.nan)
+        for symbol in static_weights:
+            row[symbols.index(symbol)] = static_weights[symbol]
+        weights = np.tile(row, (len(all_dates), 1))
+        has_weights = np.ones(len(all_dates), dtype=bool)
+
+        rebalance_dates = self._rebalance_schedule(all_dates, rebalance_period)
+        self._record_exposures(
+            rebalance_dates, np.tile(row, (len(rebalance_dates), 1))
+        )
+        self.rebalance_dates = rebalance_dates
+
+        return weights, has_weights, list(static_weights)
+
+    @staticmethod
+    def _rebalance_schedule(all_dates, rebalance_period) -> list:
+        """Rebalance dates when every rebalance succeeds: the first date, then
+        the first date on or after every `rebalance_period` days.
+        """
+        rebalance_dates = []
+        rebalance_date = all_dates[0]
+        i = 0
+        while i < len(all_dates):
+            rebalance_dates.append(all_dates[i])
+            rebalance_date = rebalance_date + datetime.timedelta(rebalance_period)
+            i = max(all_dates.searchsorted(rebalance_date), i + 1)
+        return rebalance_dates
+
+    def _record_exposures(self, dates, weights):
+        """Stores net exposure and leverage ratio of each rebalance.
+
+        @param dates: list of rebalance dates
+        @param weights: rebalances x assets array, NaN where unweighted
+        """
+        total_exposures = np.nansum(weights, axis=1)
+        leverage_ratios = np.nansum(np.abs(weights), axis=1)
+
+        self.exposures.extend(zip(dates, total_exposures))
+        self.leverage_ratios.extend(zip(dates, leverage_ratios))
+
+        if logging.getLogger().isEnabledFor(logging.INFO):
+            for date, exposure, ratio in zip(
+                dates, total_exposures, leverage_ratios
+            ):
+                logging.info(
+                    "%s net exposure: %0.3f, leverage ratio: %0.3f"
+                    % (str(date), exposure, ratio)
+                )
@@ -0,0 +1,224 @@
+"""On-disk price store. Keeps one columnar file per (source, symbol) so that
+repeated runs only have to download the last few bars already stored and
+the ones newer than them, instead of the whole history.
+"""
+
+import os
+import logging
+import datetime
+import numpy as np
+import pandas as pd
+
+# Cached bars fetched again on every refresh. They catch corrected bars and
+# adjusted prices rewritten after a dividend or split.
+OVERLAP = 5
+# Relative difference between cached and refetched prices above which the
+# cached history is stale and fetched again in full.
+TOLERANCE = 1e-6
+
+
+def _parquet_available() -> bool:
+    for module in ("pyarrow", "fastparquet"):
+        try:
+            __import__(module)
+            return True
+        except ImportError:
+            continue
+    return False
+
+
+class PriceCache(object):
+    """Local price store keyed by symbol, checked by TimeSeries.get before
+    going to the Engine.
+
+    Files live at `<directory>/<source>/<symbol>.<ext>` and hold the raw
+    frame returned by the Engine, indexed by date. Bars dated today may
+    still change, so they are returned but never stored.
+    """
+
+    def __init__(self, directory, file_format=None):
+        """
+        @param directory: str, root folder of the store
+        @param file_format: "parquet" or "csv". Defaults to parquet when a
+        parquet engine is installed, csv otherwise.
+        """
+        if file_format is None:
+            file_format = "parquet" if _parquet_available() else "csv"
+        if file_format not in ("parquet", "csv"):
+            raise ValueError("Unsupported cache format: %s" % file_format)
+
+        self.directory = directory
+        self.file_format = file_format
+
+    def path(self, source, symbol) -> str:
+        return os.path.join(
+            self.directory, source, "{}.{}".format(symbol, self.file_format)
+        )
+
+    def load(self, source, symbol):
+        """Returns the cached frame, or None if nothing is stored."""
+        path = self.path(source, symbol)
+        if not os.path.exists(path):
+            return None
+
+        if self.file_format == "parquet":
+            df = pd.read_parquet(path)
+        else:
+            df = pd.read_csv(path, index_col=0, parse_dates=True)
+        return df.sort_index()
+
+    def save(self, source, symbol, df):
+        path = self.path(source, symbol)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write to a temp file first so an interrupted run never leaves a
+        # truncated file behind.
+        tmp_path = path + ".tmp"
+        if self.file_format == "parquet":
+            df.to_parquet(tmp_path)
+        else:
+            df.to_csv(tmp_path)
+        os.replace(tmp_path, path)
+
+    def refresh(self, engine, source, symbol, **kwargs) -> pd.DataFrame:
+        """Returns the data for `symbol`, fetching from `engine` only the
+        last OVERLAP cached bars and the ones after them, or the full
+        history if the refetched bars don't match the cached ones.
+
+        @param engine: Engine class to fetch missing data from
+        @param source: str, name of the engine, used to namespace the store
+        @param symbol: str
+        @param kwargs: `start`/`end` restrict the returned frame; anything
+        else is passed through to the engine.
+        @return: pandas DataFrame
+        """
+        start = kwargs.pop("start", None)
+        end = kwargs.pop("end", None)
+
+        cached = self.load(source, symbol)
+        fetch_start = self.fetch_start(cached)
+        if fetch_start is None:
+            df = cached
+        else:
+            if cached is None:
+                logging.info("Price cache miss for %s" % symbol)
+                new = engine.get(symbol, **kwargs)
+            else:
+                logging.info(
+                    "Refreshing cached %s from %s" % (symbol, fetch_start)
+                )
+                new = engine.get(symbol, start=fetch_start, **kwargs)
+            df = self.merge(cached, new, engine.fields())
+            if df is None:
+                logging.info("Cached %s is stale, fetching it in full" % symbol)
+                df = engine.get(symbol, **kwargs)
+            self.store(source, symbol, df)
+
+        return self.restrict(df, start, end)
+
+    def refresh_many(self, engine, source, symbols, **kwargs) -> dict:
+        """Like refresh, for several symbols. Symbols that need fetching from
+        the same date are requested together through `engine.get_many`.
+
+        @return: {symbol: pandas DataFrame}
+        """
+        start = kwargs.pop("start", None)
+        end = kwargs.pop("end", None)
+
+        symbols = list(dict.fromkeys(symbols))
+        cached = {symbol: self.load(source, symbol) for symbol in symbols}
+
+        by_fetch_start = {}
+        for symbol in symbols:
+            fetch_start = self.fetch_start(cached[symbol])
+            if fetch_start is not None:
+                by_fetch_start.setdefault(fetch_start, []).append(symbol)
+
+        frames = dict(cached)
+        stale = []
+        for fetch_start, group in by_fetch_start.items():
+            logging.info(
+                "Fetching %d symbols from %s" % (len(group), fetch_start or "start")
+            )
+            if fetch_start:
+                new = engine.get_many(group, start=fetch_start, **kwargs)
+            else:
+                new = engine.get_many(group, **kwargs)
+            for symbol in group:
+                frames[symbol] = self.merge(
+                    cached[symbol], new[symbol], engine.fields()
+                )
+                if frames[symbol] is None:
+                    stale.append(symbol)
+
+        if stale:
+            logging.info("Fetching %d stale symbols in full" % len(stale))
+            frames.update(engine.get_many(stale, **kwargs))
+        for group in by_fetch_start.values():
+            for symbol in group:
+                self.store(source, symbol, frames[symbol])
+
+        return {
+            symbol: self.restrict(frames[symbol], start, end) for symbol in symbols
+        }
+
+    @staticmethod
+    def fetch_start(cached):
+        """Returns the date string to fetch from, "" for a cold fetch (full
+        history), or None if the cache is already up to date.
+        """
+        if cached is None or not len(cached):
+            return ""
+
+        next_day = cached.index[-1] + datetime.timedelta(days=1)
+        if next_day.date() > datetime.date.today():
+            return None
+        overlap_start = cached.index[max(0, len(cached) - OVERLAP)]
+        return overlap_start.strftime("%Y-%m-%d")
+
+    @staticmethod
+    def merge(cached, new, fields=None):
+        """Replaces the cached bars from the first one in `new` onwards.
+
+        @param fields: list of price columns to check the overlap on
+        @return: pandas DataFrame, or None if the prices `new` and the
+        cache have for the same dates differ, or `new` doesn't reach back
+        into the cache, so the cached history needs fetching again
+        """
+        if cached is None or not len(cached):
+            return new
+        if new is None or not len(new):
+            return cached
+
+        overlap = cached.index.intersection(new.index)
+        if not len(overlap):
+            return None
+        columns = [
+            field for field in (fields or new.columns)
+            if field in cached.columns and field in new.columns
+        ]
+        old_prices = cached.loc[overlap, columns].to_numpy(dtype=float)
+        new_prices = new.loc[overlap, columns].to_numpy(dtype=float)
+        if not np.allclose(old_prices, new_prices, rtol=TOLERANCE, equal_nan=True):
+            return None
+
+        return pd.concat([cached[cached.index < new.index[0]], new])
+
+    def store(self, source, symbol, df):
+        """Persists the bars of `df` dated before today."""
+        if df is None:
+            return
+        today = pd.Timestamp(datetime.date.today(), tz=df.index.tz)
+        df = df[df.index < today]
+        if len(df):
+            self.save(source, symbol, df)
+
+    @staticmethod
+    def restrict(df, start=None, end=None) -> pd.DataFrame:
+        if df is None:
+            return df
+        if start:
+            df = df[df.index >= start]
+        if end:
+            df = df[df.index <= end]
+        return df
@@ -0,0 +1,90 @@
+"""TradingCalendar object. Builds the union and intersection of many
+assets' trading dates once and caches, per asset, integer indexers into
+them, so aligning a series is a `take` on its values instead of an index
+search per call.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class TradingCalendar(object):
+    """Union/intersection calendar of several date indexes."""
+
+    def __init__(self, indexes):
+        """
+        @param indexes: {symbol: DatetimeIndex}, each sorted
+        """
+        self.indexes = dict(indexes)
+        self.symbols = list(self.indexes)
+
+        indexes = list(self.indexes.values())
+        if indexes:
+            union = indexes[0].append(indexes[1:]).unique().sort_values()
+        else:
+            union = pd.DatetimeIndex([])
+        names = set(index.name for index in indexes)
+        union.name = names.pop() if len(names) == 1 else None
+        self.union: pd.DatetimeIndex = union
+
+        intersection = self.union
+        for index in self.indexes.values():
+            intersection = intersection.intersection(index)
+        self.intersection: pd.DatetimeIndex = intersection
+
+        self._positions = {}
+        self._last_positions = {}
+
+    def __len__(self):
+        return len(self.union)
+
+    def positions(self, symbol) -> np.ndarray:
+        """Position in the union of each of the symbol's own dates."""
+        if symbol not in self._positions:
+            self._positions[symbol] = self.union.get_indexer(self.indexes[symbol])
+        return self._positions[symbol]
+
+    def last_positions(self, symbol) -> np.ndarray:
+        """For each union date, position in the symbol's own dates of the
+        latest one on or before it; -1 before its first date.
+        """
+        if symbol not in self._last_positions:
+            self._last_positions[symbol] = (
+                self.indexes[symbol].searchsorted(self.union, side="right") - 1
+            )
+        return self._last_positions[symbol]
+
+    def align(self, symbol, values, ffill=True) -> np.ndarray:
+        """Puts a series' values on the union calendar.
+
+        @param values: array-like, one value per date of the symbol's index
+        @param ffill: bool, repeat the last value on dates the symbol has
+        no row for, up to its last date. Otherwise those are NaN.
+        @return: numpy float array, one value per union date
+        """
+        values = np.asarray(values, dtype=float)
+        if ffill:
+            positions = self.last_positions(symbol)
+            aligned = values.take(np.maximum(positions, 0))
+            aligned[positions < 0] = np.nan
+            own = self.positions(symbol)
+            if len(own):
+                aligned[own[-1] + 1:] = np.nan
+            return aligned
+
+        aligned = np.full(len(self.union), np.nan)
+        aligned[self.positions(symbol)] = values
+        return aligned
+
+    def union_positions(self, symbols) -> np.ndarray:
+        """Positions in the union of the dates at least one of `symbols`
+        trades on, i.e. those symbols' own union calendar.
+        """
+        positions = [self.positions(symbol) for symbol in symbols]
+        if not positions:
+            return np.array([], dtype=int)
+        return np.unique(np.concatenate(positions))
+
+    def intersection_positions(self) -> np.ndarray:
+        """Positions in the union of the dates every symbol trades on."""
+        return self.union.get_indexer(self.intersection)
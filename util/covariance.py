@@ -0,0 +1,80 @@
+"""RollingCovariance object. Precomputes cumulative sums of returns and of
+their cross products, so the covariance over any window ending at any date
+is a difference of two slices instead of a pass over the history.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class RollingCovariance(object):
+    """Windowed covariances of the periodic returns of a price matrix.
+
+    Matches `prices.pct_change(periodicity).iloc[::periodicity]` followed by
+    `.tail(window).cov(min_periods)` on the rows up to a date, including
+    pairwise handling of missing values. Memory is O(dates x assets^2).
+    """
+
+    def __init__(self, prices: pd.DataFrame, periodicity=1):
+        """
+        @param prices: pandas DataFrame, dates x assets
+        @param periodicity: int, return interval, 1 for daily
+        """
+        self.symbols = list(prices.columns)
+        self.positions = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.periodicity = periodicity
+
+        returns = prices.pct_change(periodicity).iloc[::periodicity]
+        self.index: pd.DatetimeIndex = returns.index
+
+        values = returns.to_numpy(dtype=float)
+        mask = (~np.isnan(values)).astype(float)
+        values = np.nan_to_num(values, nan=0.0)
+
+        # Running sums with a leading row of zeros, so that the sum over
+        # rows [a, b) is sums[b] - sums[a]. For each pair (i, j) only rows
+        # where both returns are present count.
+        self.counts = self._cumsum(mask[:, :, None] * mask[:, None, :])
+        self.sums = self._cumsum(values[:, :, None] * mask[:, None, :])
+        self.cross_sums = self._cumsum(values[:, :, None] * values[:, None, :])
+
+    @staticmethod
+    def _cumsum(products) -> np.ndarray:
+        sums = np.zeros((len(products) + 1,) + products.shape[1:])
+        np.cumsum(products, axis=0, out=sums[1:])
+        return sums
+
+    def covariance(
+        self, as_of_date=None, window=60, min_periods=None, symbols=None
+    ) -> np.ndarray:
+        """Covariance of the last `window` returns dated on or before
+        `as_of_date`. Not annualized.
+
+        @param as_of_date: datetime object, None for the latest
+        @param window: int, number of return rows
+        @param min_periods: int, NaN out pairs with fewer observations
+        @param symbols: list of str to restrict to, in that order
+        @return: numpy array, assets x assets
+        """
+        if as_of_date is None:
+            end = len(self.index)
+        else:
+            end = self.index.searchsorted(as_of_date, side="right")
+        start = max(0, end - window)
+
+        counts = self.counts[end] - self.counts[start]
+        sums = self.sums[end] - self.sums[start]
+        cross_sums = self.cross_sums[end] - self.cross_sums[start]
+
+        if symbols is not None:
+            cols = [self.positions[symbol] for symbol in symbols]
+            counts = counts[np.ix_(cols, cols)]
+            sums = sums[np.ix_(cols, cols)]
+            cross_sums = cross_sums[np.ix_(cols, cols)]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            covariances = (cross_sums - sums * sums.T / counts) / (counts - 1)
+
+        enough = counts >= max(2, min_periods or 0)
+        covariances[~enough] = np.nan
+        return covariances
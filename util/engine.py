@@ -1,4 +1,18 @@
 import abc
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+MAX_WORKERS = 8
+RETRIES = 3
+BACKOFF = 1.0  # seconds, doubled after every failed attempt
+
+
+class NoDataError(Exception):
+    """Raised by engines whose source reports a failed or rate-limited
+    download with an empty result instead of an error, so it is retried.
+    """
+    pass
 
 
 class Engine(object):
@@ -9,6 +23,12 @@ class Engine(object):
     __metaclass__ = abc.ABCMeta
     config = None
 
+    # Errors worth retrying: network errors (requests' and urllib's are
+    # OSErrors) and empty downloads. Anything else, e.g. a TypeError, is a
+    # bug and raised at once. Engines whose failures are deterministic can
+    # set this to ().
+    retry_exceptions = (OSError, NoDataError)
+
     @abc.abstractmethod
     def get(self, symbol):
         pass
@@ -16,3 +36,62 @@ class Engine(object):
     @abc.abstractproperty
     def config(self):
         return self.config
+
+    @classmethod
+    def fields(cls) -> list:
+        """All price fields named in `config`, across asset types."""
+        fields = []
+        for asset_config in (cls.config or {}).values():
+            price_field = asset_config['price']
+            if not isinstance(price_field, list):
+                price_field = [price_field]
+            fields.extend([f for f in price_field if f not in fields])
+        return fields
+
+    @classmethod
+    def get_with_retry(cls, symbol, retries=RETRIES, backoff=BACKOFF, **kwargs):
+        """Calls `get`, retrying up to `retries` times with exponential
+        backoff.
+        """
+        for attempt in range(retries + 1):
+            try:
+                return cls.get(symbol, **kwargs)
+            except cls.retry_exceptions as e:
+                if attempt == retries:
+                    raise
+                delay = backoff * (2 ** attempt)
+                logging.warning(
+                    "Fetching %s failed (%s), retrying in %0.1fs"
+                    % (symbol, str(e), delay)
+                )
+                time.sleep(delay)
+
+    @classmethod
+    def get_many(cls,
+                 symbols,
+                 max_workers=MAX_WORKERS,
+                 retries=RETRIES,
+                 backoff=BACKOFF,
+                 **kwargs) -> dict:
+        """Fetches several symbols concurrently on a thread pool.
+
+        @param symbols: iterable of str
+        @param max_workers: int, number of concurrent fetches
+        @param retries: int, retries per symbol
+        @param backoff: float, seconds to wait before the first retry
+        @param kwargs: passed through to `get`
+        @return: {symbol: data}
+        """
+        symbols = list(dict.fromkeys(symbols))  # dedupe, keep order
+        if not symbols:
+            return {}
+
+        workers = max(1, min(max_workers, len(symbols)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                symbol: pool.submit(
+                    cls.get_with_retry, symbol, retries, backoff, **kwargs
+                )
+                for symbol in symbols
+            }
+            return {symbol: futures[symbol].result() for symbol in symbols}
@@ -0,0 +1,167 @@
+"""Exponentially weighted variance and covariance estimators. Their state is
+a few decayed sums updated recursively with each new return, so neither a
+long history nor a live feed ever has to be re-scanned, and it round-trips
+through a dict of plain lists.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def decay(halflife) -> float:
+    """Weight of a return relative to the next one's."""
+    return 0.5 ** (1.0 / halflife)
+
+
+class EWMACovariance(object):
+    """Exponentially weighted covariance of several assets' returns.
+
+    Matches `returns.ewm(halflife=halflife).cov()` on the rows seen so far,
+    including pairwise handling of missing values: for each pair (i, j) only
+    rows where both returns are present count, and older ones keep decaying
+    over rows where they are not. O(assets^2) per row, whatever the length
+    of the history.
+
+    With a `shape`, keeps that many independent estimators at once, e.g.
+    one per simulated path; rows of returns then have that shape plus one
+    axis of assets.
+    """
+
+    def __init__(self, n_assets, halflife, shape=()):
+        """
+        @param n_assets: int
+        @param halflife: float, in return rows
+        @param shape: tuple, leading dimensions of independent estimators
+        """
+        self.halflife = halflife
+        self.decay = decay(halflife)
+
+        shape = tuple(shape) + (n_assets, n_assets)
+        self.counts = np.zeros(shape)  # observations of each pair
+        self.weights = np.zeros(shape)  # sum of weights
+        self.weights_sq = np.zeros(shape)  # sum of squared weights
+        self.sums = np.zeros(shape)  # weighted sum of returns of asset i
+        self.cross_sums = np.zeros(shape)  # weighted sum of products
+
+    def update(self, returns):
+        """Adds one row of returns, NaN where missing."""
+        returns = np.asarray(returns, dtype=float)
+        present = ~np.isnan(returns)
+        both = (present[..., :, None] & present[..., None, :]).astype(float)
+        values = np.nan_to_num(returns, nan=0.0)
+
+        self.counts += both
+        self.weights *= self.decay
+        self.weights += both
+        self.weights_sq *= self.decay ** 2
+        self.weights_sq += both
+        self.sums *= self.decay
+        self.sums += values[..., :, None] * both
+        self.cross_sums *= self.decay
+        self.cross_sums += values[..., :, None] * values[..., None, :]
+
+    def update_many(self, rows) -> np.ndarray:
+        """Adds every row of a dates x assets array of returns (dates x
+        shape x assets with a `shape`).
+
+        @return: numpy array of the variances after each row, same shape
+        as `rows`
+        """
+        rows = np.asarray(rows, dtype=float)
+        variances = np.full(rows.shape, np.nan)
+        for i, row in enumerate(rows):
+            self.update(row)
+            variances[i] = np.diagonal(self.covariance(), axis1=-2, axis2=-1)
+        return variances
+
+    def covariance(self, min_periods=None) -> np.ndarray:
+        """Unbiased covariance of the rows seen so far. Not annualized.
+
+        @param min_periods: int, NaN out pairs with fewer observations
+        @return: numpy array, assets x assets (shape x assets x assets with
+        a `shape`)
+        """
+        with np.errstate(divide="ignore", invalid="ignore"):
+            means = self.sums / self.weights
+            biased = self.cross_sums / self.weights - means * np.swapaxes(
+                means, -1, -2
+            )
+            covariances = biased * self.weights ** 2 / (
+                self.weights ** 2 - self.weights_sq
+            )
+
+        enough = self.counts >= max(2, min_periods or 0)
+        covariances[~enough] = np.nan
+        return covariances
+
+    def to_dict(self) -> dict:
+        return {
+            "halflife": self.halflife,
+            "counts": self.counts.tolist(),
+            "weights": self.weights.tolist(),
+            "weights_sq": self.weights_sq.tolist(),
+            "sums": self.sums.tolist(),
+            "cross_sums": self.cross_sums.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        """Inverse of to_dict."""
+        shape = np.shape(state["counts"])
+        estimator = cls(shape[-1], state["halflife"], shape=shape[:-2])
+        for name in ("counts", "weights", "weights_sq", "sums", "cross_sums"):
+            setattr(estimator, name, np.array(state[name], dtype=float))
+        return estimator
+
+
+class ExponentialCovariance(object):
+    """Exponentially weighted covariances of the periodic returns of a
+    price matrix, as of any date. The EWMACovariance is carried forward
+    between calls, so walking through the dates in order costs one update
+    per return row overall; asking for an earlier date starts it over.
+    """
+
+    def __init__(self, prices: pd.DataFrame, periodicity=1, halflife=30):
+        """
+        @param prices: pandas DataFrame, dates x assets
+        @param periodicity: int, return interval, 1 for daily
+        @param halflife: float, in return rows
+        """
+        self.symbols = list(prices.columns)
+        self.positions = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.periodicity = periodicity
+        self.halflife = halflife
+
+        returns = prices.pct_change(periodicity).iloc[::periodicity]
+        self.index: pd.DatetimeIndex = returns.index
+        self.values = returns.to_numpy(dtype=float)
+
+        self.estimator = EWMACovariance(len(self.symbols), halflife)
+        self.end = 0  # return rows added to self.estimator
+
+    def covariance(self, as_of_date=None, min_periods=None, symbols=None):
+        """Covariance of the returns dated on or before `as_of_date`. Not
+        annualized.
+
+        @param as_of_date: datetime object, None for the latest
+        @param min_periods: int, NaN out pairs with fewer observations
+        @param symbols: list of str to restrict to, in that order
+        @return: numpy array, assets x assets
+        """
+        if as_of_date is None:
+            end = len(self.index)
+        else:
+            end = self.index.searchsorted(as_of_date, side="right")
+
+        if end < self.end:
+            self.estimator = EWMACovariance(len(self.symbols), self.halflife)
+            self.end = 0
+        for row in self.values[self.end:end]:
+            self.estimator.update(row)
+        self.end = end
+
+        covariances = self.estimator.covariance(min_periods=min_periods)
+        if symbols is not None:
+            cols = [self.positions[symbol] for symbol in symbols]
+            covariances = covariances[np.ix_(cols, cols)]
+        return covariances
@@ -0,0 +1,481 @@
+"""Incremental "weights for today". LiveState is bootstrapped once from a
+portfolio's full history and persisted; after that, each new bar updates the
+rolling volatility and covariance sums in place, so computing the latest
+weights never replays the history.
+"""
+
+import json
+import pickle
+import collections
+
+import numpy as np
+import pandas as pd
+
+from .ewma import EWMACovariance
+from .panel import PricePanel
+from . import rules
+
+# Settings the live state is bootstrapped from; a state built under other
+# values of them is stale.
+FINGERPRINT_KEYS = (
+    "ENVIRONMENTS",
+    "VOLATILITY_TARGET",
+    "VOLATILITY_ESTIMATOR",
+    "HALFLIFE",
+)
+
+
+def fingerprint(settings) -> str:
+    """Fingerprint of the settings a LiveState depends on.
+
+    @param settings: dict, as loaded from the settings file
+    @return: str
+    """
+    return json.dumps(
+        {key: settings.get(key) for key in FINGERPRINT_KEYS},
+        sort_keys=True,
+        default=str,
+    )
+
+class VolatilityState(object):
+    """Rolling variance of one asset's returns, matching
+    Asset.last_volatility as of the last bar seen.
+
+    Keeps the last `periodicity` prices, the last `window` returns with
+    their running sum and sum of squares, and the sum and count of every
+    variance so far for the expanding mean.
+    """
+
+    def __init__(self, window=30, periodicity=1):
+        self.window = window
+        self.periodicity = periodicity
+
+        self.n_bars = 0
+        self.last_price = np.nan
+        self.prices = collections.deque(maxlen=periodicity)
+        self.returns = collections.deque()
+        self.sum = 0.0
+        self.sum_sq = 0.0
+        self.n_missing = 0
+
+        self.last_var = np.nan
+        self.var_sum = 0.0
+        self.var_count = 0
+
+    @classmethod
+    def from_asset(cls, asset, window=30, periodicity=1):
+        """Bootstraps from the asset's full history."""
+        state = cls(window=window, periodicity=periodicity)
+        price: pd.Series = asset.price
+        _, vols, _ = asset.volatility_index(window=window, periodicity=periodicity)
+
+        if periodicity == 1:
+            pcts = asset.returns
+        else:
+            pcts = price.pct_change(periodicity).iloc[::periodicity]
+
+        values = price.to_numpy(dtype=float)
+        state.n_bars = len(values)
+        if len(values):
+            state.last_price = values[-1]
+        state.prices.extend(values[-periodicity:])
+        for value in pcts.to_numpy(dtype=float)[-window:]:
+            state._push(value)
+
+        if len(vols):
+            state.last_var = vols[-1]
+        state.var_sum = np.nansum(vols)
+        state.var_count = int((~np.isnan(vols)).sum())
+        return state
+
+    def update(self, price):
+        """Appends one bar. Zero or missing prices repeat the last price, as
+        in Asset.price.
+        """
+        if np.isnan(price) or price == 0:
+            price = self.last_price
+        else:
+            self.last_price = price
+
+        position = self.n_bars
+        self.n_bars += 1
+        previous = self.prices[0] if len(self.prices) == self.periodicity else np.nan
+        self.prices.append(price)
+        if position % self.periodicity:
+            return
+
+        self._push(price / previous - 1)
+        if len(self.returns) < self.window or self.n_missing:
+            self.last_var = np.nan
+            return
+
+        n = self.window
+        variance = (self.sum_sq - self.sum ** 2 / n) / (n - 1)
+        self.last_var = max(variance, 0.0) * (252.0 / self.periodicity)
+        self.var_sum += self.last_var
+        self.var_count += 1
+
+    def _push(self, value):
+        if len(self.returns) == self.window:
+            old = self.returns.popleft()
+            if np.isnan(old):
+                self.n_missing -= 1
+            else:
+                self.sum -= old
+                self.sum_sq -= old ** 2
+
+        self.returns.append(value)
+        if np.isnan(value):
+            self.n_missing += 1
+        else:
+            self.sum += value
+            self.sum_sq += value ** 2
+
+    def variance(self, average_with_expanding_mean=True) -> float:
+        """Annualized variance, NaN before there is enough history."""
+        last_var = self.last_var
+        if average_with_expanding_mean and not np.isnan(last_var):
+            mean_var = self.var_sum / self.var_count
+            last_var = ((np.sqrt(last_var) + np.sqrt(mean_var)) / 2) ** 2
+        return last_var
+
+
+class EWMAVolatilityState(object):
+    """Exponentially weighted variance of one asset's returns, matching
+    Asset.volatility_at with estimator="ewma" as of the last bar seen.
+
+    Keeps the last `periodicity` prices and an EWMACovariance of the
+    returns, so its size does not depend on the length of the history.
+    """
+
+    def __init__(self, halflife, periodicity=1):
+        self.halflife = halflife
+        self.periodicity = periodicity
+
+        self.n_bars = 0
+        self.last_price = np.nan
+        self.prices = collections.deque(maxlen=periodicity)
+        self.estimator = EWMACovariance(1, halflife)
+
+    @classmethod
+    def from_asset(cls, asset, halflife, periodicity=1):
+        """Bootstraps from the asset's full history."""
+        state = cls(halflife, periodicity=periodicity)
+        price: pd.Series = asset.price
+
+        if periodicity == 1:
+            pcts = asset.returns
+        else:
+            pcts = price.pct_change(periodicity).iloc[::periodicity]
+
+        values = price.to_numpy(dtype=float)
+        state.n_bars = len(values)
+        if len(values):
+            state.last_price = values[-1]
+        state.prices.extend(values[-periodicity:])
+        state.estimator.update_many(pcts.to_numpy(dtype=float)[:, None])
+        return state
+
+    def update(self, price):
+        """Appends one bar. Zero or missing prices repeat the last price, as
+        in Asset.price.
+        """
+        if np.isnan(price) or price == 0:
+            price = self.last_price
+        else:
+            self.last_price = price
+
+        position = self.n_bars
+        self.n_bars += 1
+        previous = self.prices[0] if len(self.prices) == self.periodicity else np.nan
+        self.prices.append(price)
+        if position % self.periodicity:
+            return
+
+        self.estimator.update([price / previous - 1])
+
+    def variance(self) -> float:
+        """Annualized variance, NaN before there are two returns."""
+        return self.estimator.covariance()[0, 0] * (252.0 / self.periodicity)
+
+
+class CovarianceState(object):
+    """Rolling covariance of several assets' returns, matching
+    RollingCovariance.covariance as of the last row seen.
+
+    Keeps the last `window` return rows and, for each pair of assets, the
+    running count, sum and sum of cross products over rows where both have
+    a return.
+    """
+
+    def __init__(self, symbols, window=60, periodicity=1):
+        self.symbols = list(symbols)
+        self.window = window
+        self.periodicity = periodicity
+
+        n = len(self.symbols)
+        self.n_rows = 0
+        self.last_prices = np.full(n, np.nan)
+        self.prices = collections.deque(maxlen=periodicity)
+        self.rows = collections.deque()
+        self.counts = np.zeros((n, n))
+        self.sums = np.zeros((n, n))
+        self.cross_sums = np.zeros((n, n))
+
+    @classmethod
+    def from_prices(cls, prices: pd.DataFrame, window=60, periodicity=1):
+        """Bootstraps from a dates x symbols price frame, e.g.
+        Portfolio.asset_df.
+        """
+        state = cls(prices.columns, window=window, periodicity=periodicity)
+        values = prices.to_numpy(dtype=float)
+        returns = prices.pct_change(periodicity).iloc[::periodicity]
+
+        state.n_rows = len(values)
+        if len(values):
+            state.last_prices = values[-1].copy()
+        state.prices.extend(values[-periodicity:])
+        for row in returns.to_numpy(dtype=float)[-window:]:
+            state._push(row)
+        return state
+
+    def update(self, prices):
+        """Appends one row.
+
+        @param prices: {symbol: price} of the assets with a bar. The others
+        repeat their last price.
+        """
+        row = self.last_prices.copy()
+        for i, symbol in enumerate(self.symbols):
+            price = prices.get(symbol, np.nan)
+            if not (np.isnan(price) or price == 0):
+                row[i] = price
+        self.last_prices = row
+
+        position = self.n_rows
+        self.n_rows += 1
+        if len(self.prices) == self.periodicity:
+            previous = self.prices[0]
+        else:
+            previous = np.full(len(row), np.nan)
+        self.prices.append(row)
+        if position % self.periodicity:
+            return
+
+        self._push(row / previous - 1)
+
+    def _push(self, returns):
+        if len(self.rows) == self.window:
+            self._add(self.rows.popleft(), -1.0)
+        self.rows.append(returns)
+        self._add(returns, 1.0)
+
+    def _add(self, returns, sign):
+        mask = (~np.isnan(returns)).astype(float)
+        values = np.nan_to_num(returns, nan=0.0)
+        self.counts += sign * np.outer(mask, mask)
+        self.sums += sign * np.outer(values, mask)
+        self.cross_sums += sign * np.outer(values, values)
+
+    def covariance(self, symbols=None) -> np.ndarray:
+        """Annualized covariance over the window.
+
+        @param symbols: list of str to restrict to, in that order
+        @return: numpy array, assets x assets
+        """
+        counts, sums, cross_sums = self.counts, self.sums, self.cross_sums
+        if symbols is not None:
+            cols = [self.symbols.index(symbol) for symbol in symbols]
+            counts = counts[np.ix_(cols, cols)]
+            sums = sums[np.ix_(cols, cols)]
+            cross_sums = cross_sums[np.ix_(cols, cols)]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            covariances = (cross_sums - sums * sums.T / counts) / (counts - 1)
+        covariances[counts < 2] = np.nan
+        return covariances * (252.0 / self.periodicity)
+
+
+class LiveState(object):
+    """Everything needed to compute a portfolio's latest weights: a
+    description of the portfolio tree, the rolling state of its estimators
+    and the last weights. Holds no Asset or Portfolio objects, so it can be
+    pickled and updated without loading any history.
+    """
+
+    def __init__(self, tree, names, volatilities, covariances, last_date,
+                 fingerprint=None):
+        """
+        @param tree: dict describing the portfolio, see rules.describe
+        @param names: {symbol: asset name}, in the order of the tree's
+        columns
+        @param volatilities: {key: VolatilityState or EWMAVolatilityState},
+        see _volatility_key
+        @param covariances: {node id: CovarianceState}
+        @param last_date: pandas Timestamp of the last bar seen
+        @param fingerprint: str, see fingerprint
+        """
+        self.tree = tree
+        self.names = names
+        self.volatilities = volatilities
+        self.covariances = covariances
+        self.last_date = last_date
+        self.fingerprint = fingerprint
+        self.last_weights = {}
+        self.warm_starts = {}
+
+    @property
+    def symbols(self) -> list:
+        return list(self.names)
+
+    @classmethod
+    def from_portfolio(cls, portfolio, fingerprint=None):
+        """Bootstraps from the full history of a portfolio's assets.
+        Covariance rows follow the union of the portfolio's own asset dates,
+        as new bars will.
+
+        @param portfolio: RiskParityPortfolio, EqualWeightPortfolio or
+        EqualRiskContributionPortfolio, possibly nested
+        @param fingerprint: str, fingerprint of the settings it was built
+        with, see fingerprint
+        """
+        panel = PricePanel(portfolio.tradeable_assets)
+        assets = portfolio.tradeable_assets
+        names = {asset.symbol: asset.name for asset in assets}
+        tree = rules.describe(portfolio, list(names))
+
+        volatilities = {}
+        covariances = {}
+        for node, node_portfolio in zip(rules.nodes(tree), _portfolios(portfolio)):
+            if node["type"] == "RiskParityPortfolio":
+                for col in node["columns"]:
+                    key = cls._volatility_key(assets[col].symbol, node)
+                    if key in volatilities:
+                        continue
+                    if node["estimator"] == "ewma":
+                        volatilities[key] = EWMAVolatilityState.from_asset(
+                            assets[col],
+                            halflife=node["halflife"],
+                            periodicity=node["periodicity"],
+                        )
+                    else:
+                        volatilities[key] = VolatilityState.from_asset(
+                            assets[col],
+                            window=node["window"],
+                            periodicity=node["periodicity"],
+                        )
+
+            if node["type"] == "EqualRiskContributionPortfolio" or (
+                node["type"] == "EqualWeightPortfolio" and node["volatility_target"]
+            ):
+                covariances[node["id"]] = CovarianceState.from_prices(
+                    node_portfolio.asset_df,
+                    window=node["window"],
+                    periodicity=node["periodicity"],
+                )
+
+        return cls(
+            tree, names, volatilities, covariances, panel.index[-1], fingerprint
+        )
+
+    @staticmethod
+    def _volatility_key(symbol, node) -> tuple:
+        """Key of a RiskParityPortfolio node's state for one of its assets,
+        shared by every node with the same estimator parameters.
+        """
+        if node["estimator"] == "ewma":
+            return (symbol, "ewma", node["halflife"], node["periodicity"])
+        return (symbol, node["window"], node["periodicity"])
+
+    def update(self, date, prices):
+        """Appends one bar. O(assets) per estimator.
+
+        @param date: datetime object, after self.last_date
+        @param prices: {symbol: price} of the assets with a bar on `date`
+        """
+        date = pd.Timestamp(date)
+        if date <= self.last_date:
+            raise ValueError(
+                "Bar dated %s is not after the last one, %s" % (date, self.last_date)
+            )
+
+        for key, state in self.volatilities.items():
+            symbol = key[0]
+            if symbol in prices:
+                state.update(prices[symbol])
+
+        for state in self.covariances.values():
+            # Portfolios only get rows on dates one of their own assets has
+            # a bar, as on their PanelView.
+            if any(prices.get(symbol, 0) for symbol in state.symbols):
+                state.update(prices)
+
+        self.last_date = date
+
+    def append(self, prices: pd.DataFrame) -> int:
+        """Appends every row of a dates x symbols price frame dated after
+        self.last_date. Missing prices mean the asset has no bar that day.
+
+        @return: int, number of bars appended
+        """
+        prices = prices[prices.index > self.last_date].sort_index()
+        for date, row in prices.iterrows():
+            self.update(date, row.dropna().to_dict())
+        return len(prices)
+
+    def weights(self) -> dict:
+        """Weights as of self.last_date, equal to what the portfolio's
+        optimize would return then. Assets without a weight are left out,
+        as optimize does.
+
+        @return: {asset_name: weight}
+        """
+        weights = rules.weights(self.tree, _Estimates(self), len(self.names))[0]
+        self.last_weights = {
+            self.names[symbol]: weight
+            for symbol, weight in zip(self.symbols, weights)
+            if not np.isnan(weight)
+        }
+        return dict(self.last_weights)
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            pickle.dump(self, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+
+class _Estimates(object):
+    """A LiveState's estimators as util.rules `estimates`, for one set of
+    weights.
+    """
+
+    size = 1
+
+    def __init__(self, state):
+        self.state = state
+        self.warm_starts = state.warm_starts
+
+    def variances(self, node) -> np.ndarray:
+        symbols = self.state.symbols
+        return np.array([[
+            self.state.volatilities[
+                LiveState._volatility_key(symbols[col], node)
+            ].variance()
+            for col in node["columns"]
+        ]])
+
+    def covariances(self, node) -> np.ndarray:
+        return self.state.covariances[node["id"]].covariance()[None]
+
+
+def _portfolios(portfolio):
+    """Every portfolio of a tree, in the order of rules.nodes."""
+    yield portfolio
+    if portfolio.is_portfolio_of_portfolios:
+        for child in portfolio.assets:
+            for sub_portfolio in _portfolios(child):
+                yield sub_portfolio
@@ -0,0 +1,84 @@
+"""Memoization of Portfolio.optimize. Nested portfolios ask their children
+for weights at the same dates several times (collapse_weights, synthetic
+returns for covariances), and portfolios over the same assets appear in
+several places of a tree; each (portfolio, date) should be solved once.
+"""
+
+import functools
+import collections
+
+DEFAULT_MAXSIZE = 10000
+
+
+class OptimizationCache(object):
+    """Bounded LRU cache with hit/miss counters."""
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE):
+        """
+        @param maxsize: int, number of results kept. 0 disables caching.
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._results = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._results)
+
+    def get(self, key):
+        """Returns the cached value, or None on a miss."""
+        if key in self._results:
+            self.hits += 1
+            self._results.move_to_end(key)
+            return self._results[key]
+
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self._results[key] = value
+        self._results.move_to_end(key)
+        while len(self._results) > self.maxsize:
+            self._results.popitem(last=False)
+
+    def clear(self):
+        self._results.clear()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._results),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+OPTIMIZE_CACHE = OptimizationCache()
+
+
+def memoize_optimize(optimize):
+    """Decorator for Portfolio.optimize. Results are keyed on
+    (portfolio.cache_key(), as_of_date) and returned as copies, since
+    callers may rescale the weights in place.
+    """
+
+    @functools.wraps(optimize)
+    def wrapper(self, as_of_date=None):
+        if not OPTIMIZE_CACHE.maxsize:
+            return optimize(self, as_of_date)
+
+        key = (self.cache_key(), as_of_date)
+        allocations = OPTIMIZE_CACHE.get(key)
+        if allocations is None:
+            allocations = optimize(self, as_of_date)
+            OPTIMIZE_CACHE.put(key, allocations)
+
+        return {name: dict(allocations[name]) for name in allocations}
+
+    return wrapper
@@ -0,0 +1,252 @@
+"""Bootstrap Monte Carlo of a portfolio's returns. Resamples the aligned
+daily returns of its assets in blocks, re-applies the portfolio's weighting
+rules on every simulated path, and returns the simulated equity curves as
+one array. Paths are simulated in chunks to bound memory, optionally on a
+process pool.
+"""
+
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from . import rules
+from .ewma import EWMACovariance
+
+METHODS = ("stationary", "block")
+
+
+def bootstrap_indices(rng, n_paths, length, n_obs, block_size=20,
+                      method="stationary") -> np.ndarray:
+    """Row indices of resampled paths, made of blocks of consecutive rows
+    that start at random rows and wrap around the end.
+
+    @param rng: numpy Generator
+    @param n_obs: int, rows to resample from
+    @param block_size: int, block length for "block", mean block length
+    for "stationary" (geometric lengths, Politis & Romano)
+    @param method: "stationary" or "block"
+    @return: numpy array of ints, n_paths x length
+    """
+    if method not in METHODS:
+        raise ValueError(
+            "Unknown bootstrap method %s, use one of %s" % (method, METHODS)
+        )
+
+    steps = np.arange(length)
+    if method == "block":
+        new_block = np.broadcast_to(steps % block_size == 0, (n_paths, length))
+    else:
+        new_block = rng.random((n_paths, length)) < 1.0 / block_size
+        new_block[:, 0] = True
+
+    # Step at which the current block started, and the row it started at.
+    block_step = np.maximum.accumulate(np.where(new_block, steps, 0), axis=1)
+    block_row = np.take_along_axis(
+        rng.integers(n_obs, size=(n_paths, length)), block_step, axis=1
+    )
+    return (block_row + steps - block_step) % n_obs
+
+
+def warmup_periods(spec) -> int:
+    """Periods simulated before the first rebalance, so every estimator in
+    the tree has a full window.
+    """
+    return max(
+        (node["window"] + 1) * node["periodicity"] for node in rules.nodes(spec)
+    )
+
+
+class _Paths(object):
+    """Per-chunk estimator inputs, computed lazily per periodicity/window
+    and shared by every node and rebalance. Serves as the util.rules
+    `estimates` as of `step`, one row per path.
+    """
+
+    def __init__(self, returns):
+        self.size = returns.shape[0]
+        self.step = 0
+        # Cumulative log prices, paths x (periods + 1) x assets.
+        self.log_prices = np.concatenate(
+            [
+                np.zeros((returns.shape[0], 1, returns.shape[2])),
+                np.cumsum(np.log1p(returns), axis=1),
+            ],
+            axis=1,
+        )
+        self._returns = {}
+        self._variances = {}
+        self.warm_starts = {}
+
+    def periodic_returns(self, periodicity) -> np.ndarray:
+        """Returns over every `periodicity` periods, paths x k x assets,
+        with k = 0 NaN as in pct_change(periodicity).iloc[::periodicity].
+        """
+        if periodicity not in self._returns:
+            sampled = self.log_prices[:, ::periodicity, :]
+            returns = np.full(sampled.shape, np.nan)
+            returns[:, 1:] = np.expm1(np.diff(sampled, axis=1))
+            self._returns[periodicity] = returns
+        return self._returns[periodicity]
+
+    def variances(self, node) -> np.ndarray:
+        """Variances of the node's assets as of self.step, paths x assets."""
+        if node["estimator"] == "ewma":
+            variances = self.ewma_variances(node["halflife"], node["periodicity"])
+        else:
+            variances = self.rolling_variances(node["window"], node["periodicity"])
+        return variances[:, self.step // node["periodicity"], node["columns"]]
+
+    def covariances(self, node) -> np.ndarray:
+        """Covariances of the node's assets as of self.step, paths x assets
+        x assets.
+        """
+        return self.window_covariances(
+            node["window"], node["periodicity"], self.step, node["columns"]
+        )
+
+    def rolling_variances(self, window, periodicity) -> np.ndarray:
+        """Rolling variances averaged with their expanding mean in stddev
+        terms, as Asset.last_volatility, paths x k x assets.
+        """
+        key = (window, periodicity)
+        if key not in self._variances:
+            returns = self.periodic_returns(periodicity)[:, 1:]
+            sums = np.cumsum(returns, axis=1)
+            sums_sq = np.cumsum(returns ** 2, axis=1)
+            sums[:, window:] -= sums[:, :-window].copy()
+            sums_sq[:, window:] -= sums_sq[:, :-window].copy()
+
+            variances = np.full(sums.shape, np.nan)
+            variances[:, window - 1:] = (
+                (sums_sq - sums ** 2 / window) / (window - 1)
+            )[:, window - 1:]
+            variances = np.maximum(variances, 0.0) * (252.0 / periodicity)
+
+            has_var = ~np.isnan(variances)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                means = np.cumsum(np.nan_to_num(variances), axis=1) / np.cumsum(
+                    has_var, axis=1
+                )
+            blended = ((np.sqrt(variances) + np.sqrt(means)) / 2) ** 2
+
+            self._variances[key] = np.concatenate(
+                [np.full_like(blended[:, :1], np.nan), blended], axis=1
+            )
+        return self._variances[key]
+
+    def ewma_variances(self, halflife, periodicity) -> np.ndarray:
+        """Exponentially weighted variances, as Asset.volatility_at with
+        estimator="ewma", paths x k x assets.
+        """
+        key = ("ewma", halflife, periodicity)
+        if key not in self._variances:
+            returns = self.periodic_returns(periodicity)
+            n_paths, _, n_assets = returns.shape
+            estimator = EWMACovariance(n_assets, halflife, shape=(n_paths,))
+            variances = estimator.update_many(np.swapaxes(returns, 0, 1))
+            self._variances[key] = np.swapaxes(variances, 0, 1) * (
+                252.0 / periodicity
+            )
+        return self._variances[key]
+
+    def window_covariances(self, window, periodicity, step, columns=None):
+        """Annualized covariance of the last `window` periodic returns as of
+        `step`, paths x assets x assets.
+        """
+        k = step // periodicity
+        returns = self.periodic_returns(periodicity)[:, k - window + 1:k + 1]
+        if columns is not None:
+            returns = returns[:, :, columns]
+        centered = returns - returns.mean(axis=1, keepdims=True)
+        covariances = np.einsum("pti,ptj->pij", centered, centered)
+        return covariances / (window - 1) * (252.0 / periodicity)
+
+
+def simulate_chunk(returns, spec, n_paths, length, block_size=20,
+                   method="stationary", rebalance_period=40, seed=None):
+    """Simulates one chunk of paths.
+
+    @param returns: numpy array of historical returns, dates x assets, no
+    missing values
+    @param spec: portfolio description, see rules.describe
+    @return: numpy array of equity curves, n_paths x (length + 1), starting
+    at 1
+    """
+    rng = np.random.default_rng(seed)
+    warmup = warmup_periods(spec)
+    indices = bootstrap_indices(
+        rng, n_paths, warmup + length, len(returns), block_size, method
+    )
+    simulated = returns[indices]
+    paths = _Paths(simulated)
+
+    portfolio_returns = np.empty((n_paths, length))
+    for start in range(warmup, warmup + length, rebalance_period):
+        stop = min(start + rebalance_period, warmup + length)
+        paths.step = start
+        weights = np.nan_to_num(
+            rules.weights(spec, paths, returns.shape[1]), nan=0.0
+        )
+        portfolio_returns[:, start - warmup:stop - warmup] = np.einsum(
+            "pti,pi->pt", simulated[:, start:stop], weights
+        )
+
+    curves = np.ones((n_paths, length + 1))
+    np.cumprod(1.0 + portfolio_returns, axis=1, out=curves[:, 1:])
+    return curves
+
+
+def historical_returns(portfolio):
+    """Daily returns of the portfolio's assets on the dates they all have
+    one.
+
+    @return: (numpy array, dates x assets; list of symbols)
+    """
+    pcts = portfolio.asset_df.pct_change().dropna()
+    return pcts.to_numpy(dtype=float), list(pcts.columns)
+
+
+def simulate(portfolio, n_paths=1000, length=252 * 10, block_size=20,
+             method="stationary", rebalance_period=40, chunk_size=250,
+             processes=1, seed=None) -> np.ndarray:
+    """Monte Carlo of the portfolio's equity curve.
+
+    Each path resamples the assets' joint daily returns, so
+    cross-sectional correlation is kept and serial correlation within
+    blocks. Weights are recomputed from each path's own simulated history
+    every `rebalance_period` periods, after a warmup that fills the
+    longest estimator window.
+
+    @param portfolio: RiskParityPortfolio, EqualWeightPortfolio or
+    EqualRiskContributionPortfolio, possibly nested
+    @param n_paths: int, number of simulated paths
+    @param length: int, periods per path
+    @param block_size: int, (mean) block length, see bootstrap_indices
+    @param method: "stationary" or "block"
+    @param rebalance_period: int, periods between rebalances
+    @param chunk_size: int, paths simulated at once
+    @param processes: int, worker processes. 1 simulates in this process,
+    None uses every core.
+    @param seed: int, makes the result reproducible for any `processes`
+    @return: numpy array of equity curves, n_paths x (length + 1)
+    """
+    returns, symbols = historical_returns(portfolio)
+    spec = rules.describe(portfolio, symbols)
+
+    sizes = [min(chunk_size, n_paths - i) for i in range(0, n_paths, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    args = [
+        (returns, spec, size, length, block_size, method, rebalance_period, s)
+        for size, s in zip(sizes, seeds)
+    ]
+
+    if processes == 1:
+        chunks = [simulate_chunk(*chunk_args) for chunk_args in args]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            chunks = list(pool.map(_simulate_chunk, args))
+
+    return np.concatenate(chunks, axis=0)
+
+
+def _simulate_chunk(args):
+    return simulate_chunk(*args)
@@ -0,0 +1,172 @@
+"""PricePanel object. Holds the aligned prices of many assets as a single
+dates x symbols matrix, so portfolios over the same tickers share one copy
+of the data instead of each joining their own. Each portfolio reads it
+through a PanelView restricted to the dates its own assets trade on, so
+its prices don't depend on which other tickers are in the panel, and
+which holds no data of its own.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .calendar import TradingCalendar
+
+
+class PricePanel(object):
+    """Aligned price matrix plus a symbol -> column index."""
+
+    def __init__(self, assets):
+        """Builds the panel on the union of the assets' dates. Each asset's
+        price is forward filled over dates it has no row for (e.g. holidays
+        on another exchange), never before its first price or after its
+        last one.
+
+        @param assets: list of Asset. The first asset given for a symbol
+        wins.
+        """
+        self.assets = {}
+        for asset in assets:
+            self.assets.setdefault(asset.symbol, asset)
+        self.symbols = list(self.assets)
+
+        prices = {symbol: self.assets[symbol].price for symbol in self.symbols}
+        self.calendar = TradingCalendar(
+            {symbol: prices[symbol].index for symbol in self.symbols}
+        )
+        self.index: pd.DatetimeIndex = self.calendar.union
+        self.values: np.ndarray = np.empty((len(self.index), len(self.symbols)))
+        for i, symbol in enumerate(self.symbols):
+            self.values[:, i] = self.calendar.align(symbol, prices[symbol].to_numpy())
+        self.columns = {symbol: i for i, symbol in enumerate(self.symbols)}
+
+        # Position of each column's first price. Prices are forward filled,
+        # so every later row up to its last price has one.
+        has_price = ~np.isnan(self.values)
+        self.starts = np.where(
+            has_price.any(axis=0), has_price.argmax(axis=0), len(self.index)
+        )
+        self._returns = None
+        self._views = {}
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def returns(self) -> np.ndarray:
+        """Returns of every column from one date to the next, computed once.
+        The first row and rows without a price are NaN.
+        """
+        if self._returns is None:
+            self._returns = np.full(self.values.shape, np.nan)
+            self._returns[1:] = self.values[1:] / self.values[:-1] - 1.0
+        return self._returns
+
+    def contains(self, assets) -> bool:
+        """Whether every asset (the same object, not just the symbol) is in
+        the panel.
+        """
+        return all(self.assets.get(asset.symbol) is asset for asset in assets)
+
+    def indices(self, symbols) -> np.ndarray:
+        return np.array([self.columns[symbol] for symbol in symbols], dtype=int)
+
+    def view(self, symbols):
+        """PanelView of some of the symbols, built once per list of
+        symbols.
+        """
+        key = tuple(symbols)
+        if key not in self._views:
+            self._views[key] = PanelView(self, symbols)
+        return self._views[key]
+
+    def frame(self, cols) -> pd.DataFrame:
+        """Prices of the given columns as a DataFrame, keeping only dates
+        where at least one of them has a bar.
+
+        @param cols: array of column indices
+        """
+        return self.view([self.symbols[col] for col in cols]).frame()
+
+
+class PanelView(object):
+    """Prices of some of a panel's symbols on their own calendar: the dates
+    at least one of them has a bar. Holds only row and column positions
+    into the panel and slices its arrays when asked, so views cost no copy
+    of the data however many portfolios share a symbol.
+    """
+
+    def __init__(self, panel, symbols):
+        """
+        @param panel: PricePanel
+        @param symbols: list of str, all in the panel
+        """
+        self.panel = panel
+        self.symbols = list(symbols)
+        self.columns = {symbol: i for i, symbol in enumerate(self.symbols)}
+
+        self.rows = panel.calendar.union_positions(self.symbols)
+        self.cols = panel.indices(self.symbols)
+        self.index: pd.DatetimeIndex = panel.index[self.rows]
+
+        # Position of each column's first price. Every symbol has a row on
+        # its own first date.
+        self.starts = self.rows.searchsorted(panel.starts[self.cols])
+
+    def __len__(self):
+        return len(self.index)
+
+    def indices(self, symbols) -> np.ndarray:
+        return np.array([self.columns[symbol] for symbol in symbols], dtype=int)
+
+    @property
+    def values(self) -> np.ndarray:
+        """Prices, dates x symbols. A new array on every call."""
+        return self.panel.values[np.ix_(self.rows, self.cols)]
+
+    def returns(self, start=0, end=None, cols=None) -> np.ndarray:
+        """Returns of the given columns from one of the view's dates to the
+        next, over rows [start, end). The first row and rows without a
+        price are NaN.
+
+        Between two of the view's dates none of its symbols has a bar, so
+        their panel prices are forward filled and flat: the panel's return
+        on the later date is the return over the whole gap.
+
+        @param cols: array of view column indices, by default all
+        @return: numpy array, rows x cols
+        """
+        cols = self.cols if cols is None else self.cols[cols]
+        return self.panel.returns[np.ix_(self.rows[start:end], cols)]
+
+    def start(self, cols=None) -> int:
+        """First row where at least one of the given columns, by default
+        any, has a price.
+        """
+        starts = self.starts if cols is None else self.starts[cols]
+        return int(starts.min()) if len(starts) else len(self.index)
+
+    def frame(self) -> pd.DataFrame:
+        """Prices as a DataFrame, dates x symbols."""
+        return pd.DataFrame(self.values, index=self.index, columns=self.symbols)
+
+
+_SHARED_PANEL = None
+
+
+def set_shared_panel(panel):
+    """Sets the panel portfolios use by default, e.g. one built up front
+    over every ticker of a run.
+    """
+    global _SHARED_PANEL
+    _SHARED_PANEL = panel
+
+
+def get_shared_panel(assets) -> PricePanel:
+    """Returns the shared panel, rebuilding it over the union of its assets
+    and `assets` if some of them are missing.
+    """
+    global _SHARED_PANEL
+    if _SHARED_PANEL is None or not _SHARED_PANEL.contains(assets):
+        known = [] if _SHARED_PANEL is None else list(_SHARED_PANEL.assets.values())
+        _SHARED_PANEL = PricePanel(list(assets) + known)
+    return _SHARED_PANEL
@@ -5,20 +5,49 @@ import numpy as np
 import pandas as pd
 
 from .asset import Asset
+from .panel import get_shared_panel
+from .covariance import RollingCovariance
+from .ewma import EWMACovariance, ExponentialCovariance
+from .synthetic import SyntheticReturns
+from .profiler import PROFILER, profiled
 from . import util
 
+# Volatility/covariance estimators: windowed, or exponentially weighted with
+# a half-life.
+ESTIMATORS = ("rolling", "ewma")
+
 
 class Portfolio(object):
     """Class for standard interface for portfolio construction."""
 
-    def __init__(self, assets, window=60, periodicity=1, volatility_target=0.1):
+    def __init__(
+        self,
+        assets,
+        window=60,
+        periodicity=1,
+        volatility_target=0.1,
+        panel=None,
+        estimator="rolling",
+        halflife=None,
+    ):
         """Accepts a list of Asset or Portfolio
 
         @param assets: list of Asset or Portfolio
         @param window: int, volatility window
         @param periodicity: int, return interval, 1 for daily
         @param volatility_target: float from 0 to 1, to denote target vol
+        @param panel: PricePanel holding the prices of all assets. Defaults
+        to the shared panel.
+        @param estimator: "rolling" for variances over the last `window`
+        returns, "ewma" for exponentially weighted ones
+        @param halflife: float, half-life in returns of the "ewma" estimator
         """
+        if estimator not in ESTIMATORS:
+            raise ValueError(
+                "Unknown estimator %r, expected one of %s" % (estimator, ESTIMATORS)
+            )
+        if estimator == "ewma" and not halflife:
+            raise ValueError("The ewma estimator needs a halflife.")
 
         # Must be all Portfolio objects or all Asset objects.
         num_portfolio_objs = sum([isinstance(a, Portfolio) for a in assets])
@@ -34,6 +63,8 @@ class Portfolio(object):
         self.assets = assets
         self.window = window
         self.periodicity = periodicity
+        self.estimator = estimator
+        self.halflife = halflife
         if volatility_target:
             self.volatility_target = volatility_target ** 2
         else:
@@ -43,13 +74,129 @@ class Portfolio(object):
         # may also include Portfolios.
         self.tradeable_assets = self._get_all_asset_objs(assets)
 
-        first_symbol = self.tradeable_assets[0].symbol
-        self.asset_df = self.tradeable_assets[0].price.to_frame(first_symbol)
-        for i in range(1, len(self.tradeable_assets)):
-            curr_asset = self.tradeable_assets[i]
-            self.asset_df = self.asset_df.join(
-                curr_asset.price.to_frame(curr_asset.symbol)
+        # Prices live in a panel shared across portfolios; only keep a view
+        # of our columns on the dates our assets trade on.
+        if panel is None:
+            panel = get_shared_panel(self.tradeable_assets)
+        self.panel = panel
+        self.panel_view = panel.view(
+            [asset.symbol for asset in self.tradeable_assets]
+        )
+
+        # RollingCovariance per periodicity, built on first use.
+        self._covariances = {}
+        # SyntheticReturns of the sub-portfolios per window length.
+        self._synthetic = {}
+        # ExponentialCovariance per (periodicity, halflife).
+        self._exponential_covariances = {}
+
+    @property
+    def asset_df(self) -> pd.DataFrame:
+        """Prices of self.tradeable_assets, one column per symbol."""
+        return self.panel_view.frame()
+
+    def rolling_covariance(self, periodicity=1) -> RollingCovariance:
+        """Covariance provider over self.asset_df, built once per
+        periodicity.
+        """
+        if periodicity in self._covariances:
+            PROFILER.incr("covariance_cache_hits")
+        else:
+            PROFILER.incr("covariance_cache_misses")
+            self._covariances[periodicity] = RollingCovariance(
+                self.asset_df, periodicity=periodicity
             )
+        return self._covariances[periodicity]
+
+    def exponential_covariance(self, periodicity=1, halflife=30):
+        """Exponentially weighted covariance provider over self.asset_df,
+        built once per periodicity and halflife.
+        """
+        key = (periodicity, halflife)
+        if key in self._exponential_covariances:
+            PROFILER.incr("covariance_cache_hits")
+        else:
+            PROFILER.incr("covariance_cache_misses")
+            self._exponential_covariances[key] = ExponentialCovariance(
+                self.asset_df, periodicity=periodicity, halflife=halflife
+            )
+        return self._exponential_covariances[key]
+
+    def synthetic_returns(self, maxlen) -> list:
+        """SyntheticReturns of each sub-portfolio over the last `maxlen`
+        rows of self.asset_df, built once per window length.
+        """
+        if maxlen not in self._synthetic:
+            start = self.panel_view.start()
+            self._synthetic[maxlen] = [
+                SyntheticReturns(portfolio, self.panel_view, start, maxlen)
+                for portfolio in self.assets
+            ]
+        return self._synthetic[maxlen]
+
+    def cache_key(self) -> tuple:
+        """Identifies what optimize depends on: the portfolio type, its
+        assets (recursively) and its parameters. Portfolios with equal keys
+        share memoized optimize results.
+        """
+        items = tuple(
+            item.cache_key() if isinstance(item, Portfolio) else id(item)
+            for item in self.assets
+        )
+        return (type(self).__name__, items, self._cache_params())
+
+    def _cache_params(self) -> tuple:
+        """Parameters optimize depends on. Extend in child classes that add
+        their own.
+        """
+        return (
+            self.window,
+            self.periodicity,
+            self.volatility_target,
+            self.estimator,
+            self.halflife,
+        )
+
+    def first_valid_dates(self, min_returns=2) -> dict:
+        """First date each tradeable asset has `min_returns` returns at
+        self.periodicity, read off the running counts of the NaN mask of
+        self.asset_df.
+
+        @return: {symbol: date, or None if never}
+        """
+        covariances = self.rolling_covariance(self.periodicity)
+        counts = np.diagonal(covariances.counts[1:], axis1=1, axis2=2)
+
+        dates = {}
+        for symbol, i in covariances.positions.items():
+            n = counts[:, i].searchsorted(min_returns)
+            dates[symbol] = covariances.index[n] if n < len(counts) else None
+        return dates
+
+    def first_valid_date(self):
+        """First date optimize can weight any asset, so backtests can start
+        there instead of trying earlier dates. None if there is none.
+        Override in child classes with different data requirements.
+        """
+        if self.is_portfolio_of_portfolios:
+            dates = [portfolio.first_valid_date() for portfolio in self.assets]
+        elif self.volatility_target:
+            # Scaling needs a variance.
+            dates = list(self.first_valid_dates(min_returns=2).values())
+        else:
+            dates = [asset.price.first_valid_index() for asset in self.assets]
+
+        dates = [date for date in dates if date is not None]
+        return min(dates) if dates else None
+
+    def static_weights(self):
+        """Weights if they are the same on every date, else None. Lets
+        backtests skip optimize entirely. Override in child classes whose
+        weights can be date-independent.
+
+        @return: {symbol: weight} or None
+        """
+        return None
 
     def _get_all_asset_objs(self, asset_list) -> list:
         """Helper function for init, to get all tradeable assets
@@ -105,6 +252,7 @@ class Portfolio(object):
             price = asset.price
             print(str(price.index[0]) + "\t" + asset.name)
 
+    @profiled("Portfolio.collapse_weights")
     def collapse_weights(self, assets_or_portfolios, weights, as_of_date=None):
         """Given a list of assets or portfolios and a corresponding list of
         weights, create an allocation of weights to individual Assets,
@@ -148,28 +296,32 @@ class Portfolio(object):
             }
         return collapsed_weights
 
+    @profiled("Portfolio.create_synthetic_returns")
     def create_synthetic_returns(self, portfolio, as_of_date):
         """Create synthetic returns of a portfolio as of a certain date
         """
-        daily_pcts = self.asset_df.pct_change()
-        daily_pcts = daily_pcts[daily_pcts.index <= as_of_date]
-
         weights = portfolio.optimize(as_of_date=as_of_date)
+        if not weights:
+            raise IndexError(
+                "No weights to create synthetic returns from as of %s" % as_of_date
+            )
 
-        weighted_returns = []
-        for asset_name in weights:
-            asset = weights[asset_name]["asset"]
-            weight = weights[asset_name]["weight"]
-            weighted_returns.append(weight * daily_pcts[asset.symbol])
-
-        returns = weighted_returns[0]
-        for i in range(1, len(weighted_returns)):
-            curr_returns = weighted_returns[i].reindex(returns.index, method="nearest")
-            returns = returns + curr_returns
-
+        # Every asset is already aligned on our calendar, so the weighted
+        # sum is a product with the returns matrix.
+        view = self.panel_view
+        start = view.start()
+        end = view.index.searchsorted(as_of_date, side="right")
+        cols = view.indices([weights[name]["asset"].symbol for name in weights])
+        w = np.array([weights[name]["weight"] for name in weights])
+
+        returns = pd.Series(
+            view.returns(start, end, cols) @ w,
+            index=view.index[start:end],
+        )
         indexed = util.one_index(returns.dropna())
         return indexed
 
+    @profiled("Portfolio.covariance_matrix")
     def covariance_matrix(
         self,
         assets_to_use=None,
@@ -179,6 +331,8 @@ class Portfolio(object):
         min_periods=None,
         as_of_date=None,
         annualize=True,
+        estimator=None,
+        halflife=None,
     ):
         """Return pandas dataframe
 
@@ -199,49 +353,102 @@ class Portfolio(object):
         @as_of_date: datetime object
 
         @annualize: bool
+
+        @estimator: "rolling" or "ewma", defaults to self.estimator. The
+        "ewma" estimator ignores window, except with use_portfolios_only
+        where it weights the last `window` synthetic returns.
+
+        @halflife: float, defaults to self.halflife
         """
+        estimator = estimator or self.estimator
+        halflife = halflife or self.halflife
+        if estimator not in ESTIMATORS:
+            raise ValueError(
+                "Unknown estimator %r, expected one of %s" % (estimator, ESTIMATORS)
+            )
+        if estimator == "ewma" and not halflife:
+            raise ValueError("The ewma estimator needs a halflife.")
+
         if use_portfolios_only:
             assert self.is_portfolio_of_portfolios
             assert assets_to_use is None
 
-        # Set default as_of_date.
-        if not as_of_date:
-            as_of_date = self.asset_df.index[-1]
-
         # If we care about the covariance of entire portfolios, create
         # synthetic return series.
         if use_portfolios_only and self.is_portfolio_of_portfolios:
-            # create synthetic return series
-            subportfolio_returns = []
-            for portfolio in self.assets:
-                indexed = self.create_synthetic_returns(portfolio, as_of_date)
-                subportfolio_returns.append(indexed)
-
-            # join the synthetic returns
-            all_indexed = subportfolio_returns[0]
-            for i in range(1, len(subportfolio_returns)):
-                all_indexed = all_indexed.join(
-                    subportfolio_returns[i], rsuffix="_%d" % i
+            # Set default as_of_date.
+            if not as_of_date:
+                as_of_date = self.asset_df.index[-1]
+
+            # Synthetic daily returns of each sub-portfolio over the last
+            # rows only, weighted as of as_of_date.
+            buffers = self.synthetic_returns((window + 1) * periodicity)
+            # Every sub-portfolio's weights first, so a date without any
+            # raises before anything is sliced.
+            weights = [buffer.weights(as_of_date) for buffer in buffers]
+            windows = [
+                buffer.window(as_of_date, buffer_weights)
+                for buffer, buffer_weights in zip(buffers, weights)
+            ]
+            positions, _, first = windows[0]
+            daily = np.column_stack([values for _, values, _ in windows])
+
+            # Compound into returns over `periodicity` rows, on rows a whole
+            # number of periods after the first sub-portfolio's first
+            # return. That row is kept without a return in any column, as
+            # the first row of a differenced index would be.
+            if periodicity > 1:
+                padding = np.full((periodicity - 1, daily.shape[1]), np.nan)
+                daily = np.lib.stride_tricks.sliding_window_view(
+                    np.vstack([padding, 1.0 + daily]), periodicity, axis=0
+                ).prod(axis=-1) - 1.0
+            daily[positions == first] = np.nan
+            keep = (positions >= first) & ((positions - first) % periodicity == 0)
+            daily = daily[keep]
+
+            columns = ["Value"] + ["Value_%d" % i for i in range(1, len(buffers))]
+            pct_returns = pd.DataFrame(daily, columns=columns)
+
+            # Finally, do the covariance calculation.
+            if estimator == "ewma":
+                ewma = EWMACovariance(len(columns), halflife)
+                for row in pct_returns.tail(window).to_numpy():
+                    ewma.update(row)
+                covariances = pd.DataFrame(
+                    ewma.covariance(min_periods=min_periods),
+                    index=columns,
+                    columns=columns,
                 )
-
-            pct_returns = all_indexed.pct_change(periodicity).iloc[::periodicity]
+            elif min_periods:
+                covariances = pct_returns.tail(window).cov(min_periods=min_periods)
+            else:
+                covariances = pct_returns.tail(window).cov()
         else:
-            as_of_df = self.asset_df[self.asset_df.index <= as_of_date]
-
             # Only keep certain assets.
+            symbols = [asset.symbol for asset in self.tradeable_assets]
             if assets_to_use is not None:
-                keep_assets = [asset.symbol for asset in assets_to_use]
-                as_of_df = as_of_df[keep_assets]
-
-            # Get the right periodicity.
-            pct_returns = as_of_df.pct_change(periodicity).iloc[::periodicity]
-
-        # Finally, do the covariance calculation and annualize if necessary.
-        if min_periods:
-            covariances = pct_returns.tail(window).cov(min_periods=min_periods)
-        else:
-            covariances = pct_returns.tail(window).cov()
+                symbols = [asset.symbol for asset in assets_to_use]
+
+            if estimator == "ewma":
+                # Recursive state, carried forward from the last as-of date.
+                covariances = self.exponential_covariance(
+                    periodicity, halflife
+                ).covariance(
+                    as_of_date=as_of_date or None,
+                    min_periods=min_periods,
+                    symbols=symbols,
+                )
+            else:
+                # Windowed lookup into precomputed running sums.
+                covariances = self.rolling_covariance(periodicity).covariance(
+                    as_of_date=as_of_date or None,
+                    window=window,
+                    min_periods=min_periods,
+                    symbols=symbols,
+                )
+            covariances = pd.DataFrame(covariances, index=symbols, columns=symbols)
 
+        # Annualize if necessary.
         if annualize:
             covariances = covariances * (252.0 / periodicity)
 
@@ -273,14 +480,35 @@ class Portfolio(object):
         assert not np.isnan(portfolio_vol)
         return portfolio_vol
 
+    @profiled("Portfolio.scale_weights_to_vol_target")
     def scale_weights_to_vol_target(self, collapsed_weights, as_of_date):
         """Scale weights to volatility target. Multiplies the portfolio by the
         right scale factor in *variance* terms, not stddev terms.
         """
         assets = [collapsed_weights[name]["asset"] for name in collapsed_weights]
-        weights = [collapsed_weights[name]["weight"] for name in collapsed_weights]
-
-        portfolio_vol = self.get_portfolio_volatility(assets, weights, as_of_date)
+        covariances = self.covariance_matrix(
+            assets_to_use=assets,
+            window=self.window,
+            periodicity=self.periodicity,
+            as_of_date=as_of_date,
+        ).to_numpy()
+
+        # Assets without a variance yet (e.g. they start trading later than
+        # the rest) are left out until they have one. With none left there
+        # is nothing to scale.
+        has_variance = ~np.isnan(np.diag(covariances))
+        for name, keep in zip(list(collapsed_weights), has_variance):
+            if not keep:
+                del collapsed_weights[name]
+        if not collapsed_weights:
+            return collapsed_weights
+
+        covariances = covariances[np.ix_(has_variance, has_variance)]
+        w = np.array(
+            [collapsed_weights[name]["weight"] for name in collapsed_weights]
+        )
+        portfolio_vol = w @ covariances @ w
+        assert not np.isnan(portfolio_vol)
 
         vol_scale = np.sqrt(self.volatility_target / portfolio_vol)
 
@@ -290,13 +518,8 @@ class Portfolio(object):
             )
 
         # Do a sanity check.
-        scaled_weights = [
-            collapsed_weights[name]["weight"] for name in collapsed_weights
-        ]
-
-        _portfolio_vol = self.get_portfolio_volatility(
-            assets, scaled_weights, as_of_date
-        )
+        scaled = vol_scale * w
+        _portfolio_vol = scaled @ covariances @ scaled
 
         assert self.volatility_target - _portfolio_vol <= 1e-4
         return collapsed_weights
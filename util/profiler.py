@@ -0,0 +1,115 @@
+"""Optional instrumentation of backtest hot paths. Disabled by default; when
+disabled, instrumented functions only pay for one attribute check.
+"""
+
+import json
+import time
+import functools
+import collections
+
+import pandas as pd
+
+
+class Profiler(object):
+    """Collects per-call timings, call counts and named counters."""
+
+    def __init__(self):
+        self.enabled = False
+        self.reset()
+
+    def reset(self):
+        self.timings = collections.defaultdict(float)
+        self.calls = collections.defaultdict(int)
+        self.counters = collections.defaultdict(int)
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def record(self, name, seconds):
+        self.timings[name] += seconds
+        self.calls[name] += 1
+
+    def incr(self, name, n=1):
+        if self.enabled:
+            self.counters[name] += n
+
+    def report(self) -> dict:
+        """Structured report of everything recorded, plus cache statistics.
+        Timings are inclusive, so nested calls are also part of their
+        callers' totals.
+        """
+        from .memo import OPTIMIZE_CACHE
+
+        timings = {
+            name: {
+                "calls": self.calls[name],
+                "total_seconds": self.timings[name],
+                "mean_ms": 1000.0 * self.timings[name] / self.calls[name],
+            }
+            for name in sorted(self.timings, key=self.timings.get, reverse=True)
+        }
+
+        counters = dict(self.counters)
+        caches = {"optimize": OPTIMIZE_CACHE.stats()}
+        for cache in ("price", "volatility_index", "covariance"):
+            hits = counters.get("%s_cache_hits" % cache, 0)
+            misses = counters.get("%s_cache_misses" % cache, 0)
+            if hits or misses:
+                caches[cache] = {
+                    "hits": hits,
+                    "misses": misses,
+                    "hit_rate": hits / (hits + misses),
+                }
+
+        return {"timings": timings, "counters": counters, "caches": caches}
+
+    def summary(self) -> str:
+        """Human readable table of the report."""
+        report = self.report()
+        lines = []
+        if report["timings"]:
+            table = pd.DataFrame(report["timings"]).T
+            table["calls"] = table["calls"].astype(int)
+            lines.append(table.to_string(float_format="%0.3f"))
+        for name, value in sorted(report["counters"].items()):
+            lines.append("%s: %d" % (name, value))
+        for name, stats in report["caches"].items():
+            lines.append(
+                "%s cache hit rate: %0.1f%% (%d hits, %d misses)"
+                % (name, 100 * stats["hit_rate"], stats["hits"], stats["misses"])
+            )
+        return "\n".join(lines)
+
+    def dump(self, path):
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+
+
+PROFILER = Profiler()
+
+
+def profiled(name=None):
+    """Decorator recording the wall time of each call under `name`
+    (defaults to the function's qualified name) while PROFILER is enabled.
+    """
+
+    def decorator(func):
+        label = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not PROFILER.enabled:
+                return func(*args, **kwargs)
+
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                PROFILER.record(label, time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,122 @@
+"""Rebalancing simulation with drift and costs. Between trades, holdings move
+with their assets' returns instead of being reset to target every day; each
+trade pays costs on its turnover. Trades happen on scheduled rebalances, or
+only when holdings drift outside a band around the target.
+"""
+
+import numpy as np
+
+# Dates simulated per step while looking for the next band breach.
+BLOCK = 63
+
+
+def simulate(returns, targets, scheduled, trading_cost=0.0, slippage=0.0,
+             band=None, block=BLOCK):
+    """Simulates holdings that drift between trades.
+
+    Row t of `targets` is set at the close of date t and earns row t + 1 of
+    `returns`, as in SanityBacktester.backtest. Weights are fractions of
+    portfolio value; whatever is left over is cash earning nothing.
+
+    Drift is computed a segment at a time: from the holdings after a trade,
+    the weights before every later close are the cumulative growth of each
+    position over the growth of the portfolio, so the only loop is over
+    trades (and blocks of `block` dates without one).
+
+    @param returns: numpy array, dates x assets. NaN counts as flat.
+    @param targets: numpy array of target weights, dates x assets. NaN
+    rows keep the previous target, NaN entries otherwise mean zero.
+    @param scheduled: boolean numpy array, dates on which targets are
+    (re)computed
+    @param trading_cost: float, cost as a fraction of traded value
+    @param slippage: float, adverse price move as a fraction of traded
+    value
+    @param band: float or None. None trades to target on every scheduled
+    date. Otherwise trades, on any date, only once some asset's weight is
+    more than `band` away from its target.
+    @param block: int, dates examined per step when using a band
+    @return: dict of numpy arrays, one row per date: "returns" (net of
+    costs), "gross_returns", "turnover", "costs", and "weights" (holdings
+    after each close, dates x assets). Rows before the first target and
+    the last row (no next return) are NaN.
+    """
+    returns = np.nan_to_num(np.asarray(returns, dtype=float), nan=0.0)
+    targets = np.asarray(targets, dtype=float)
+    scheduled = np.asarray(scheduled, dtype=bool)
+    n_dates, n_assets = returns.shape
+    cost_rate = trading_cost + slippage
+
+    has_target = ~np.isnan(targets).all(axis=1)
+    # Carry each target forward over dates that have none.
+    last_target = np.maximum.accumulate(
+        np.where(has_target, np.arange(n_dates), 0)
+    )
+    targets = np.nan_to_num(targets[last_target], nan=0.0)
+
+    gross = np.full(n_dates, np.nan)
+    turnover = np.full(n_dates, np.nan)
+    weights = np.full((n_dates, n_assets), np.nan)
+    if not has_target.any():
+        return _result(gross, turnover, turnover, weights)
+
+    # First trade, out of cash.
+    t = int(np.argmax(has_target))
+    held = targets[t].copy()
+    turnover[t:] = 0.0
+    turnover[t] = np.abs(held).sum()
+    weights[t] = held
+
+    while t < n_dates - 1:
+        if band is None:
+            # Up to and including the next scheduled date.
+            later = np.flatnonzero(scheduled[t + 1:])
+            stop = t + 1 + later[0] if len(later) else n_dates - 1
+        else:
+            stop = min(t + block, n_dates - 1)
+
+        # Growth of each position and of the portfolio after close t.
+        growth = np.cumprod(1.0 + returns[t + 1:stop + 1], axis=0)
+        positions = held * growth
+        value = 1.0 - held.sum() + positions.sum(axis=1)
+        drifted = positions / value[:, None]
+        gross[t:stop] = value / np.concatenate([[1.0], value[:-1]]) - 1.0
+
+        if band is None:
+            trades = scheduled[t + 1:stop + 1]
+        else:
+            deviation = np.abs(drifted - targets[t + 1:stop + 1]).max(axis=1)
+            trades = deviation > band
+
+        if trades.any():
+            k = int(np.argmax(trades))
+            t += k + 1
+            weights[t - k:t] = drifted[:k]
+            turnover[t] = np.abs(targets[t] - drifted[k]).sum()
+            held = targets[t].copy()
+        else:
+            weights[t + 1:stop + 1] = drifted
+            held = drifted[-1]
+            t = stop
+        weights[t] = held
+
+    costs = turnover * cost_rate
+    return _result(gross, turnover, costs, weights)
+
+
+def _result(gross, turnover, costs, weights) -> dict:
+    net = (1.0 + gross) * (1.0 - costs) - 1.0
+    return {
+        "returns": net,
+        "gross_returns": gross,
+        "turnover": turnover,
+        "costs": costs,
+        "weights": weights,
+    }
+
+
+def annual_turnover(turnover, periods_per_year=252) -> float:
+    """Average one-way turnover per year, excluding the initial purchase."""
+    turnover = turnover[~np.isnan(turnover)]
+    if len(turnover) < 2:
+        return 0.0
+    return turnover[1:].sum() * periods_per_year / len(turnover)
@@ -0,0 +1,142 @@
+"""Weighting rules of the portfolio types, applied to a light description of
+a portfolio tree instead of Portfolio objects. LiveState applies them to the
+estimators it keeps up to date, and the Monte Carlo simulation to a batch of
+simulated paths at once.
+
+The estimators are supplied by an `estimates` object with:
+- `size`: int, number of rows (paths) weighted at once
+- `variances(node)`: annualized variances of the node's assets, size x
+  assets, as the node's RiskParityPortfolio computes them
+- `covariances(node)`: annualized covariances of the node's assets, size x
+  assets x assets
+- `warm_starts`: dict, last weights solved per node id
+"""
+
+import numpy as np
+
+from .RiskParityPortfolio import RiskParityPortfolio, inverse_volatility_weights
+from .EqualWeightPortfolio import EqualWeightPortfolio
+from .EqualRiskContributionPortfolio import (
+    EqualRiskContributionPortfolio,
+    solve_erc,
+    scale_to_volatility_target,
+)
+
+SUPPORTED = (RiskParityPortfolio, EqualWeightPortfolio, EqualRiskContributionPortfolio)
+
+
+def describe(portfolio, symbols, nodes=None) -> dict:
+    """Describes a portfolio tree as nested dicts, with assets replaced by
+    their column in `symbols`. Holds no Asset or Portfolio objects, so it
+    can be pickled cheaply.
+
+    @param portfolio: RiskParityPortfolio, EqualWeightPortfolio or
+    EqualRiskContributionPortfolio, possibly nested
+    @param symbols: list of str, including every asset of the tree
+    @param nodes: list the nodes are appended to, in depth-first order; a
+    node's "id" is its position in it
+    @return: dict
+    """
+    if not isinstance(portfolio, SUPPORTED):
+        raise NotImplementedError(
+            "No weighting rules for %s" % type(portfolio).__name__
+        )
+    if nodes is None:
+        nodes = []
+
+    node = {
+        "id": len(nodes),
+        "type": type(portfolio).__name__,
+        "window": portfolio.window,
+        "periodicity": portfolio.periodicity,
+        "estimator": portfolio.estimator,
+        "halflife": portfolio.halflife,
+        "volatility_target": portfolio.volatility_target,
+        "tolerance": getattr(portfolio, "tolerance", None),
+        "max_iterations": getattr(portfolio, "max_iterations", None),
+        # Every asset held anywhere below the node.
+        "columns": [
+            symbols.index(asset.symbol) for asset in portfolio.tradeable_assets
+        ],
+    }
+    nodes.append(node)
+
+    if portfolio.is_portfolio_of_portfolios:
+        node["children"] = [
+            describe(child, symbols, nodes) for child in portfolio.assets
+        ]
+    return node
+
+
+def nodes(tree):
+    """Every node of a tree, depth first."""
+    yield tree
+    for child in tree.get("children", []):
+        for node in nodes(child):
+            yield node
+
+
+def weights(node, estimates, n_assets) -> np.ndarray:
+    """Weights of a node, as its portfolio's optimize would compute them.
+
+    @param node: dict, see describe
+    @param estimates: estimators to weight with, see the module docstring
+    @param n_assets: int, length of the `symbols` the tree was described
+    with
+    @return: numpy array, estimates.size x n_assets. NaN for assets the
+    node doesn't hold or that have no weight yet.
+    """
+    result = np.full((estimates.size, n_assets), np.nan)
+    columns = node["columns"]
+    target = node["volatility_target"]
+
+    if node["type"] == "RiskParityPortfolio":
+        vols = estimates.variances(node)
+        node_weights = inverse_volatility_weights(vols)
+        if target:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                portfolio_vol = np.nansum((node_weights ** 2) * vols, axis=1)
+                node_weights = node_weights * np.sqrt(target / portfolio_vol)[:, None]
+        result[:, columns] = node_weights
+        return result
+
+    if node["type"] == "EqualRiskContributionPortfolio":
+        covariances = estimates.covariances(node)
+        node_weights = solve_erc(
+            covariances,
+            x0=estimates.warm_starts.get(node["id"]),
+            tolerance=node["tolerance"],
+            max_iterations=node["max_iterations"],
+        )
+        if not np.isnan(node_weights).all():
+            estimates.warm_starts[node["id"]] = node_weights
+        node_weights, _ = scale_to_volatility_target(
+            covariances, node_weights, target
+        )
+        result[:, columns] = node_weights
+        return result
+
+    # EqualWeightPortfolio.
+    children = node.get("children")
+    if children:
+        weight = 1.0 / len(children)
+        child_weights = np.array(
+            [weights(child, estimates, n_assets) for child in children]
+        )
+        held = ~np.isnan(child_weights).all(axis=0)
+        result[held] = weight * np.nansum(child_weights, axis=0)[held]
+    else:
+        result[:, columns] = 1.0 / len(columns)
+
+    if target:
+        covariances = estimates.covariances(node)
+        node_weights = result[:, columns]
+        held = ~np.isnan(node_weights)
+        w = np.where(held, node_weights, 0.0)
+        pairs = held[:, :, None] & held[:, None, :]
+        with np.errstate(invalid="ignore"):
+            products = w[:, :, None] * covariances * w[:, None, :]
+        portfolio_vol = np.where(pairs, products, 0.0).sum(axis=(1, 2))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            result = result * np.sqrt(target / portfolio_vol)[:, None]
+    return result
@@ -1,5 +1,6 @@
 """Base class for stocks. Inherits from asset."""
 from .asset import Asset
+from . import timeseries
 
 
 class Stock(Asset):
@@ -7,8 +8,35 @@ class Stock(Asset):
     Constructor is the same as Asset base class.
     """
 
-    def __init__(self, symbol, name=None, source="yahoo", interval="daily"):
+    def __init__(self, symbol, name=None, source="yahoo", interval="daily",
+                 data=None, price_only=None, dtype=None):
         if name is None:
             name = symbol
 
-        super(Stock, self).__init__(symbol, name, "stock", source, interval)
+        super(Stock, self).__init__(
+            symbol, name, "stock", source, interval, data=data,
+            price_only=price_only, dtype=dtype
+        )
+
+    @classmethod
+    def bulk_load(cls, symbols, source="yahoo", interval="daily",
+                  price_only=None, dtype=None, **kwargs):
+        """Fetches every symbol with a single Engine.get_many call (through
+        the price cache, if set) and builds a Stock for each.
+
+        @param symbols: iterable of str
+        @param price_only: bool, see TimeSeries
+        @param dtype: numpy dtype, see TimeSeries
+        @param kwargs: passed to Engine.get_many, e.g. max_workers
+        @return: {symbol: Stock}
+        """
+        frames = timeseries.get_many(
+            source, symbols, interval=interval, **kwargs
+        )
+        return {
+            symbol: cls(
+                symbol, source=source, interval=interval, data=data,
+                price_only=price_only, dtype=dtype
+            )
+            for symbol, data in frames.items()
+        }
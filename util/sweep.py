@@ -0,0 +1,172 @@
+"""Parameter sweeps of the All Weather backtest. Asset data is loaded once,
+then every combination of the grid is backtested on a process pool and
+summarized in one results table.
+"""
+
+import itertools
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from . import analytics
+from .panel import PricePanel, set_shared_panel
+from .backtester import SanityBacktester
+from .RiskParityPortfolio import RiskParityPortfolio
+from .EqualWeightPortfolio import EqualWeightPortfolio
+
+# Grid keys under SWEEP in the settings file, with the setting each one
+# defaults to when not swept.
+GRID_KEYS = {
+    "VOLATILITY_TARGET": "VOLATILITY_TARGET",
+    "WINDOW": None,
+    "PERIODICITY": None,
+    "REBALANCE_PERIOD": None,
+    "ENVIRONMENTS": "ENVIRONMENTS",
+    "VOLATILITY_ESTIMATOR": "VOLATILITY_ESTIMATOR",
+    "HALFLIFE": "HALFLIFE",
+}
+DEFAULTS = {
+    "WINDOW": 60,
+    "PERIODICITY": 1,
+    "REBALANCE_PERIOD": 60,
+    "VOLATILITY_ESTIMATOR": "rolling",
+    "HALFLIFE": None,
+}
+
+
+def build_all_weather(cache, environments, volatility_target, window=60,
+                      periodicity=1, estimator="rolling", halflife=None):
+    """Builds one RiskParityPortfolio per environment and an
+    EqualWeightPortfolio over them.
+
+    @param cache: {ticker: Asset}
+    @param environments: {environment: list of tickers}
+    @return: (EqualWeightPortfolio, {environment: RiskParityPortfolio})
+    """
+    portfolios = {
+        environment: RiskParityPortfolio(
+            [cache[ticker] for ticker in environments[environment]],
+            window=window,
+            periodicity=periodicity,
+            volatility_target=volatility_target,
+            estimator=estimator,
+            halflife=halflife,
+        )
+        for environment in environments
+    }
+    return EqualWeightPortfolio(list(portfolios.values())), portfolios
+
+
+def parameter_grid(settings) -> list:
+    """Expands the SWEEP section of the settings into one dict of
+    parameters per combination. Unswept parameters take their single-run
+    value. Parameters the combination's estimator ignores (WINDOW for
+    "ewma", HALFLIFE for "rolling") are None, and combinations that only
+    differed in them are dropped.
+    """
+    sweep = settings.get("SWEEP") or {}
+    axes = {}
+    for key, setting in GRID_KEYS.items():
+        if key in sweep:
+            axes[key] = list(sweep[key])
+        elif setting is not None:
+            axes[key] = [settings.get(setting, DEFAULTS.get(key))]
+        else:
+            axes[key] = [DEFAULTS[key]]
+
+    keys = list(axes)
+    grid = []
+    for values in itertools.product(*axes.values()):
+        params = dict(zip(keys, values))
+        if params["VOLATILITY_ESTIMATOR"] == "ewma":
+            params["WINDOW"] = None
+        else:
+            params["HALFLIFE"] = None
+        if params not in grid:
+            grid.append(params)
+    return grid
+
+
+def sweep_tickers(settings) -> set:
+    """Every ticker any combination of the grid needs."""
+    tickers = set()
+    for params in parameter_grid(settings):
+        for environment_tickers in params["ENVIRONMENTS"].values():
+            tickers.update(environment_tickers)
+    return tickers
+
+
+# Per-process state, set once by _init_worker.
+_WORKER = {}
+
+
+def _init_worker(cache, start, end):
+    _WORKER["cache"] = cache
+    _WORKER["start"] = start
+    _WORKER["end"] = end
+    set_shared_panel(PricePanel(list(cache.values())))
+
+
+def run_combination(params) -> dict:
+    """Backtests one combination and returns its parameters and metrics.
+    A combination that fails gets its error in the "ERROR" column instead
+    of aborting the sweep.
+    """
+    row = dict(params)
+    row["ENVIRONMENTS"] = "; ".join(
+        "%s: %s" % (name, ",".join(tickers))
+        for name, tickers in params["ENVIRONMENTS"].items()
+    )
+
+    try:
+        pcts = _backtest(params)
+    except Exception as e:
+        logging.warning("Sweep combination %s failed: %s" % (row, str(e)))
+        row["ERROR"] = str(e)
+        return row
+
+    metrics = analytics.summary(pcts.sum(axis=1).to_frame("All Weather"))
+    row.update(metrics["All Weather"].to_dict())
+    return row
+
+
+def _backtest(params) -> pd.DataFrame:
+    all_weather, _ = build_all_weather(
+        _WORKER["cache"],
+        params["ENVIRONMENTS"],
+        params["VOLATILITY_TARGET"],
+        window=params["WINDOW"] or DEFAULTS["WINDOW"],
+        periodicity=params["PERIODICITY"],
+        estimator=params["VOLATILITY_ESTIMATOR"],
+        halflife=params["HALFLIFE"],
+    )
+    return SanityBacktester(all_weather).backtest(
+        start_date=_WORKER["start"],
+        end_date=_WORKER["end"],
+        rebalance_period=params["REBALANCE_PERIOD"],
+    )
+
+
+def run_sweep(cache, settings, start, end, processes=None) -> pd.DataFrame:
+    """Backtests every combination of the SWEEP grid.
+
+    @param cache: {ticker: Asset}, already loaded
+    @param settings: dict, parsed settings file
+    @param start: datetime object
+    @param end: datetime object
+    @param processes: int, worker processes. None uses every core.
+    @return: pandas DataFrame, one row of parameters and metrics per
+    combination
+    """
+    grid = parameter_grid(settings)
+    logging.info("Sweeping %d combinations" % len(grid))
+
+    with ProcessPoolExecutor(
+        max_workers=processes,
+        initializer=_init_worker,
+        initargs=(cache, start, end),
+    ) as pool:
+        rows = list(pool.map(run_combination, grid))
+
+    return pd.DataFrame(rows)
@@ -0,0 +1,67 @@
+"""SyntheticReturns object. Slices the last window of panel rows behind a
+sub-portfolio's synthetic daily returns, so portfolio-of-portfolios
+covariances only weight that window instead of the whole history on each
+as-of date.
+"""
+
+import numpy as np
+
+
+class SyntheticReturns(object):
+    """Last rows of a portfolio's weighted daily returns.
+
+    The returns in the window are weighted with the portfolio's weights as
+    of its last date, so they only depend on that date. The portfolio's
+    first return is dropped, as when its returns were compounded into an
+    index starting at 1 + that return and differenced again.
+    """
+
+    def __init__(self, portfolio, panel, start, maxlen):
+        """
+        @param portfolio: Portfolio whose returns to synthesize
+        @param panel: PanelView of its parent portfolio, holding its assets
+        @param start: int, first panel row to use
+        @param maxlen: int, rows to keep
+        """
+        self.portfolio = portfolio
+        self.panel = panel
+        self.start = start
+        self.maxlen = maxlen
+
+    def weights(self, as_of_date):
+        """The portfolio's weights as of a date, as panel columns.
+
+        @return: (column indices, weights), numpy arrays
+        """
+        weights = self.portfolio.optimize(as_of_date=as_of_date)
+        if not weights:
+            raise IndexError(
+                "No weights to create synthetic returns from as of %s" % as_of_date
+            )
+        cols = self.panel.indices(
+            [weights[name]["asset"].symbol for name in weights]
+        )
+        w = np.array([weights[name]["weight"] for name in weights])
+        return cols, w
+
+    def window(self, as_of_date, weights=None):
+        """The last `maxlen` rows up to and including `as_of_date`, weighted
+        as of that date.
+
+        @param weights: (column indices, weights) as returned by
+        self.weights(as_of_date), if already computed
+        @return: (panel row positions, daily returns, position of the first
+        return), the returns NaN up to and including that position
+        """
+        end = self.panel.index.searchsorted(as_of_date, side="right")
+        cols, w = weights or self.weights(as_of_date)
+
+        begin = min(max(self.start, end - self.maxlen), end)
+        positions = np.arange(begin, end)
+        values = self.panel.returns(begin, end, cols) @ w
+
+        # Every weighted asset has a return from the row after its first
+        # price.
+        first = int(self.panel.starts[cols].max()) + 1
+        values[positions <= first] = np.nan
+        return positions, values, first
@@ -1,42 +1,132 @@
 import logging
+import numpy as np
 import pandas as pd
 import datetime
 from numbers import Number
 
 from .YahooEngine import YahooEngine
+from .LocalEngine import LocalEngine
 
 ENGINES = {
     'yahoo': YahooEngine,
+    'local': LocalEngine,
 }
 
+# Optional PriceCache consulted by TimeSeries.get before hitting the Engine.
+PRICE_CACHE = None
+
+# How TimeSeries store their data unless told otherwise, see
+# set_data_options.
+PRICE_ONLY = False
+PRICE_DTYPE = None
+
+
+def set_price_cache(cache):
+    """Sets the PriceCache used by every TimeSeries. Pass None to disable."""
+    global PRICE_CACHE
+    PRICE_CACHE = cache
+
+
+def set_data_options(price_only=False, dtype=None):
+    """Sets how every TimeSeries created afterwards stores its data.
+
+    @param price_only: bool, keep only the price columns named in the
+    Engine's config and drop the rest (Open, High, Volume, ...)
+    @param dtype: numpy dtype of the stored columns, e.g. "float32". None
+    keeps the fetched dtypes.
+    """
+    global PRICE_ONLY, PRICE_DTYPE
+    PRICE_ONLY = price_only
+    PRICE_DTYPE = dtype
+
+
+def compact_frame(df, columns=None, dtype=None) -> pd.DataFrame:
+    """Projects `df` onto the given columns (those it has) and stores them
+    as a single contiguous array, column by column.
+
+    @param columns: list of str, None keeps every column
+    @param dtype: numpy dtype, None keeps a common dtype of the columns
+    """
+    if columns is None:
+        columns = list(df.columns)
+    columns = [column for column in columns if column in df.columns]
+    values = np.asfortranarray(df[columns].to_numpy(dtype=dtype))
+    return pd.DataFrame(values, index=df.index, columns=columns, copy=False)
+
+
+def get_engine(source):
+    if source not in ENGINES:
+        raise NotImplementedError(
+            "Engine {} not yet implemented. Please select from {}"
+            .format(source, str(ENGINES.keys()))
+        )
+    return ENGINES[source]
+
+
+def get_many(source, symbols, **kwargs) -> dict:
+    """Fetches raw data for several symbols at once through the Engine's
+    get_many, going through the price cache if one is set.
+
+    @return: {symbol: pandas DataFrame}
+    """
+    engine = get_engine(source)
+    if PRICE_CACHE is not None:
+        return PRICE_CACHE.refresh_many(engine, source, symbols, **kwargs)
+    return engine.get_many(symbols, **kwargs)
+
 
 class TimeSeries(object):
-    def __init__(self, source):
+    def __init__(self, source, price_only=None, dtype=None):
         """
         Initializes a TimeSeries object.
 
         @param source: str, denoting which Engine to use
+        @param price_only: bool, keep only the Engine's price columns.
+        Defaults to PRICE_ONLY.
+        @param dtype: numpy dtype to store the data as. Defaults to
+        PRICE_DTYPE.
         """
         self.source = source
-        if source not in ENGINES:
-            raise NotImplementedError(
-                "Engine {} not yet implemented. Please select from {}"
-                .format(source, str(ENGINES.keys()))
-            )
-        else:
-            self.engine = ENGINES[source]
+        self.engine = get_engine(source)
+        self.price_only = PRICE_ONLY if price_only is None else price_only
+        self.dtype = PRICE_DTYPE if dtype is None else dtype
 
         self.data = None
         self._interval = ""
+        self.clear_cache()
 
     def get(self, symbol, **kwargs):
         if pd.isnull(symbol):
             raise TypeError("Argument 'symbol' can not be nan.")
 
-        self.data = self.engine.get(symbol, **kwargs)
+        if PRICE_CACHE is not None:
+            data = PRICE_CACHE.refresh(
+                self.engine, self.source, symbol, **kwargs
+            )
+        else:
+            data = self.engine.get(symbol, **kwargs)
+
+        return self.set_data(data)
 
+    def set_data(self, data):
+        """Replaces the raw data and drops anything computed from it."""
+        if data is not None and (self.price_only or self.dtype):
+            data = compact_frame(
+                data,
+                columns=self.engine.fields() if self.price_only else None,
+                dtype=self.dtype,
+            )
+        self.data = data
+        self._interval = ""
+        self.clear_cache()
         return self.data
 
+    def clear_cache(self):
+        """Meant to be overriden by subclasses that memoize values derived
+        from self.data.
+        """
+        pass
+
     @property
     def interval(self):
         if self.data is not None:
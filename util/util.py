@@ -3,24 +3,14 @@ import numpy as np
 
 
 def one_index(series: pd.Series, use_ln=False) -> pd.DataFrame:
-    values = [1]
-    for i, pct_change in series.iteritems():
-        if len(values) > 1:
-            values.append(
-                {
-                    "Date": i,
-                    "Value": values[-1]["Value"] * (1 + pct_change)
-                }
-            )
-        else:  # first value
-            values.append({
-                "Date": i,
-                "Value": (1 + pct_change)
-            })
-
-    df = pd.DataFrame.from_records(values[1:]).set_index("Date")
+    """Compounds percentage changes into an index starting at
+    1 + the first change.
+    """
+    values = np.cumprod(1 + series.to_numpy(dtype=float))
+    df = pd.DataFrame({"Value": values}, index=series.index)
+    df.index.name = "Date"
     if use_ln:
-        df['Value'] = df['Value'].apply(np.log)
+        df['Value'] = np.log(df['Value'])
     return df
 
 
@@ -0,0 +1,113 @@
+"""Rolling start-date (walk-forward) analysis. Backtests once over the full
+history, then evaluates every (start date, holding horizon) pair by slicing
+that one return path, instead of re-running the backtest per start date.
+
+Because weights only depend on data up to each rebalance, slicing gives the
+result of starting on a later date, except that rebalances keep the full
+run's schedule rather than restarting at each start date.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .analytics import PERIODS_PER_YEAR
+
+METRICS = ("CAGR", "Sharpe", "Max Drawdown")
+
+
+def start_positions(index, start=None, end=None, every="QS") -> np.ndarray:
+    """Positions in `index` of the first date on or after each date of a
+    regular schedule.
+
+    @param index: DatetimeIndex of the return path
+    @param start: datetime object, defaults to the first date
+    @param end: datetime object, defaults to the last date
+    @param every: pandas offset alias of the schedule, e.g. "QS" or "6MS"
+    @return: numpy array of unique positions
+    """
+    start = index[0] if start is None else start
+    end = index[-1] if end is None else end
+    schedule = pd.date_range(start, end, freq=every)
+    if not len(schedule) or schedule[0] != pd.Timestamp(start):
+        schedule = schedule.insert(0, pd.Timestamp(start))
+    positions = index.searchsorted(schedule)
+    return np.unique(positions[positions < len(index)])
+
+
+def walk_forward(returns, starts, horizons, periods_per_year=PERIODS_PER_YEAR):
+    """CAGR, Sharpe and max drawdown of holding from every start for every
+    horizon, computed with cumulative sums over the one return path.
+
+    @param returns: pandas Series of periodic portfolio returns. Missing
+    returns count as flat.
+    @param starts: positions in `returns` to start holding at, see
+    start_positions
+    @param horizons: list of ints, holding periods in number of returns
+    @return: {metric: pandas DataFrame, start dates x horizons}. Pairs
+    running past the end of the history are NaN.
+    """
+    values = np.nan_to_num(returns.to_numpy(dtype=float), nan=0.0)
+    starts = np.asarray(starts, dtype=int)
+    horizons = np.asarray(horizons, dtype=int)
+    n = len(values)
+
+    # Prefix sums with a leading zero: the sum over [i, j) is s[j] - s[i].
+    log_growth = np.concatenate([[0.0], np.cumsum(np.log1p(values))])
+    sums = np.concatenate([[0.0], np.cumsum(values)])
+    sums_sq = np.concatenate([[0.0], np.cumsum(values ** 2)])
+
+    ends = starts[:, None] + horizons[None, :]
+    valid = ends <= n
+    ends = np.minimum(ends, n)
+    begin = starts[:, None]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth = np.exp(log_growth[ends] - log_growth[begin])
+        cagr = growth ** (periods_per_year / horizons[None, :]) - 1.0
+
+        mean = (sums[ends] - sums[begin]) / horizons[None, :]
+        variance = (sums_sq[ends] - sums_sq[begin]) / horizons[None, :] - mean ** 2
+        sharpe = (
+            mean * periods_per_year
+            / (np.sqrt(np.maximum(variance, 0.0)) * np.sqrt(periods_per_year))
+        )
+
+    # Drawdowns need running peaks from each start, so build the growth
+    # path of every start over the longest horizon in one array.
+    longest = horizons.max()
+    offsets = np.arange(1, longest + 1)
+    positions = np.minimum(starts[:, None] + offsets[None, :], n)
+    paths = np.exp(log_growth[positions] - log_growth[starts][:, None])
+    # The starting capital of 1.0 is the first peak.
+    peaks = np.maximum.accumulate(np.maximum(paths, 1.0), axis=1)
+    worst = np.minimum.accumulate(paths / peaks - 1.0, axis=1)
+    drawdown = worst[:, horizons - 1]
+
+    for metric in (cagr, sharpe, drawdown):
+        metric[~valid] = np.nan
+
+    index = returns.index[starts]
+    index.name = "Start"
+    columns = pd.Index(horizons, name="Horizon")
+    return {
+        name: pd.DataFrame(metric, index=index, columns=columns)
+        for name, metric in zip(METRICS, (cagr, sharpe, drawdown))
+    }
+
+
+def walk_forward_years(returns, start=None, end=None, every="QS",
+                       horizon_years=(1, 3, 5, 10),
+                       periods_per_year=PERIODS_PER_YEAR):
+    """walk_forward on a calendar schedule of starts, with horizons in
+    years.
+
+    @return: {metric: pandas DataFrame, start dates x horizon years}
+    """
+    returns = returns.dropna()
+    starts = start_positions(returns.index, start=start, end=end, every=every)
+    horizons = [int(round(years * periods_per_year)) for years in horizon_years]
+
+    results = walk_forward(returns, starts, horizons, periods_per_year)
+    for table in results.values():
+        table.columns = pd.Index(list(horizon_years), name="Years")
+    return results